@@ -0,0 +1,151 @@
+# advice.py
+#
+# Client for the chat-completions API behind the AI advice section. All calls
+# share one pooled HTTP session with timeouts and retries, and responses are
+# kept in the on-disk cache so the same prompt is never paid for twice.
+# ADVICE_API_URL points the client at another OpenAI-compatible endpoint,
+# e.g. a local stub server in tests.
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+import cache
+
+load_dotenv()
+
+API_URL = os.getenv("ADVICE_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+MODEL = os.getenv("ADVICE_MODEL", "mistralai/mixtral-8x7b-instruct")
+# (connect, read) seconds
+TIMEOUT = (5, float(os.getenv("ADVICE_TIMEOUT", 60)))
+RETRIES = int(os.getenv("ADVICE_RETRIES", 3))
+PREFETCH_WORKERS = 4
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    """Return the process-wide HTTP session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None,  # POST is safe to retry here: the request has no side effects
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PREFETCH_WORKERS, max_retries=retry)
+            _session = requests.Session()
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def cache_key(model, prompt):
+    digest = hashlib.sha256(json.dumps([model, prompt]).encode('utf-8')).hexdigest()
+    return f"advice-{digest}"
+
+
+def _post(prompt, model, url, stream=False):
+    body = {"model": model, "messages": [{"role": "user", "content": prompt}]}
+    if stream:
+        body["stream"] = True
+    return session().post(
+        url or API_URL,
+        headers={
+            "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+            "Content-Type": "application/json",
+        },
+        json=body,
+        timeout=TIMEOUT,
+        stream=stream,
+    )
+
+
+def complete(prompt, model=None, url=None):
+    """Return the model's reply to ``prompt``, from the disk cache when possible.
+
+    Raises ``requests.RequestException`` or ``ValueError`` when the API fails
+    or answers with something that is not a completion, or with an empty one;
+    failures are not cached.
+    """
+    model = model or MODEL
+    key = cache_key(model, prompt)
+    cached = cache.load_bytes(key, '.txt')
+    if cached:
+        return cached.decode('utf-8')
+
+    response = _post(prompt, model, url)
+    response.raise_for_status()
+    try:
+        content = response.json()['choices'][0]['message']['content']
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Unexpected response: {response.text[:500]}") from e
+    if not content:
+        raise ValueError("Empty reply")
+
+    cache.store_bytes(key, content.encode('utf-8'), '.txt')
+    return content
+
+
+def stream(prompt, model=None, url=None):
+    """Yield the model's reply to ``prompt`` in pieces as the API streams them.
+
+    Uses the server-sent events mode of the chat-completions API. A cached
+    reply is yielded in one piece; a streamed reply is cached once ``[DONE]``
+    arrived. Raises like ``complete``, possibly after some pieces were
+    yielded, also when the stream ends early.
+    """
+    model = model or MODEL
+    key = cache_key(model, prompt)
+    cached = cache.load_bytes(key, '.txt')
+    if cached:
+        yield cached.decode('utf-8')
+        return
+
+    pieces = []
+    finished = False
+    with _post(prompt, model, url, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            # Blank lines separate events; lines starting with ':' are keep-alive comments
+            if not line.startswith(b'data:'):
+                continue
+            data = line[len(b'data:'):].strip()
+            if data == b'[DONE]':
+                finished = True
+                break
+            try:
+                delta = json.loads(data)['choices'][0].get('delta', {})
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise ValueError(f"Unexpected event: {data[:500]!r}") from e
+            if delta.get('content'):
+                pieces.append(delta['content'])
+                yield delta['content']
+
+    if not finished:
+        raise ValueError("Stream ended before [DONE]")
+    if not pieces:
+        raise ValueError("Empty reply")
+    cache.store_bytes(key, ''.join(pieces).encode('utf-8'), '.txt')
+
+
+def complete_many(prompts, model=None, url=None, max_workers=PREFETCH_WORKERS):
+    """Complete ``{name: prompt}`` concurrently; returns ``{name: reply or exception}``."""
+    def run(prompt):
+        try:
+            return complete(prompt, model, url)
+        except (requests.RequestException, ValueError) as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        replies = pool.map(run, prompts.values())
+        return dict(zip(prompts, replies))
@@ -1,10 +1,15 @@
 # app.py
 
 import streamlit as st
-import preprocess
+import cache
 import helper
+import preprocess
+import profiling
+import search
 import selection
-from layout import render_navbar
+import store
+import warmup
+from layout import render_navbar, render_profiling_panel, render_warmup_progress
 
 st.set_page_config(page_title="WhatsApp Chat Analyzer", layout="wide")
 
@@ -61,6 +66,18 @@ uploaded_file = st.sidebar.file_uploader("Choose a WhatsApp chat (.txt)", type=[
 # Theme toggle
 is_dark = st.sidebar.checkbox("🌙 Dark Mode", value=True)
 
+# Opt-in profiling of this rerun; the panel is drawn at the end of the script
+profiling.instrument(preprocess, ['preprocess'])
+profiling.instrument(helper)
+profiling.instrument(selection)
+profiling.instrument(store, ['load_chat', 'chats', 'aggregates'])
+profiling.stop()  # left running if the previous rerun ended with st.rerun()
+profile = None
+if st.sidebar.checkbox("⏱️ Profiling", value=False):
+    # tracemalloc slows Python code down several times, so memory is a second opt-in
+    trace_memory = st.sidebar.checkbox("Track peak memory (slower)", value=False)
+    profile = profiling.Profile(trace_memory=trace_memory).start()
+
 # Dark Mode Styling
 if is_dark:
     st.markdown("""
@@ -86,11 +103,39 @@ if 'analysis_ready' not in st.session_state:
 
 # --- File Handling & Sidebar Selection ---
 if uploaded_file:
-    bytes_data = uploaded_file.getvalue()
-    data = bytes_data.decode("utf-8")
-    df = preprocess.preprocess(data)
+    # Hashing a large export takes a while, so it is only done once per upload
+    file_id = getattr(uploaded_file, 'file_id', None)
+    if file_id is not None and st.session_state.get('upload', (None, None))[0] == file_id:
+        chat_key = st.session_state.upload[1]
+    else:
+        uploaded_file.seek(0)
+        chat_key = cache.chat_hash(uploaded_file)
+    # Parse and aggregate once per chat; reruns reuse the prepared frame, which
+    # also keeps per-message results memoized for it (e.g. sentiment scores)
+    profiling.count("session chat", st.session_state.get('chat_key') == chat_key)
+    if st.session_state.get('chat_key') != chat_key:
+        _, df = cache.parse_cached(uploaded_file, chat_key)
+        if store.ENABLED:
+            # Timelines and stats are then queried from the store instead of a cube
+            if not store.has_chat(chat_key):
+                with st.spinner("Saving chat to the message store..."):
+                    store.load_chat(chat_key, df, name=uploaded_file.name)
+        else:
+            # The cube is built before sorting: incremental updates slice the
+            # frame by its parsed row order
+            st.session_state.cube = helper.load_or_build_cube(chat_key, df)
+        st.session_state.df = helper.sort_by_date(df)
+        st.session_state.chat_key = chat_key
+        # The previous chat's queued warm-up would only hold its frame and delay this one
+        if st.session_state.get('view') is not None:
+            warmup.pool.cancel(st.session_state.view[0])
+        st.session_state.view = None
+        st.session_state.warmup_paused = False
+    # Only remembered once the chat parsed; a failed upload is hashed and parsed again
+    st.session_state.upload = (file_id, chat_key)
+    chat_df = st.session_state.df
 
-    user_list = df['user'].unique().tolist()
+    user_list = chat_df['user'].unique().tolist()
     if 'group_notification' in user_list:
         user_list.remove('group_notification')
     user_list.sort()
@@ -98,15 +143,57 @@ if uploaded_file:
 
     selected_user = st.sidebar.selectbox("Analyze chat for:", user_list)
 
+    # A file without WhatsApp message headers parses to no messages and has no dates
+    if chat_df.empty:
+        st.warning("⚠️ No messages found. Please upload a chat exported from WhatsApp.")
+        st.stop()
+
+    # Every section works on the messages inside the selected date range. The
+    # slice is kept in the session so per-message results memoized for it
+    # survive reruns; sections cache their results under view_key.
+    first_day, last_day = chat_df['date'].min().date(), chat_df['date'].max().date()
+    date_range = st.sidebar.date_input("📅 Date range", value=(first_day, last_day), min_value=first_day,
+                                       max_value=last_day, key=f"date_range_{chat_key}")
+    start, end = date_range if len(date_range) == 2 else (date_range[0], last_day)
+    view_key = chat_key if (start, end) == (first_day, last_day) else f"{chat_key}-{start:%Y%m%d}-{end:%Y%m%d}"
+    profiling.count("session date range", (st.session_state.view or (None,))[0] == view_key)
+    if (st.session_state.view or (None,))[0] != view_key:
+        if st.session_state.view is not None:
+            warmup.pool.cancel(st.session_state.view[0])
+        view_df = helper.date_slice(chat_df, start, end)
+        if store.ENABLED:
+            # Answered by GROUP BY queries on the stored messages, on first use
+            view_aggregates = store.aggregates(chat_key, start, end)
+        else:
+            view_aggregates = helper.aggregates_from_cube(helper.cube_date_slice(st.session_state.cube, start, end))
+        st.session_state.view = (view_key, view_df, view_aggregates)
+    _, df, aggregates = st.session_state.view
+
+    # Prepare the sections in the background before they are opened, for the
+    # selected user first; tasks queued or done already are skipped
+    if not st.session_state.get('warmup_paused'):
+        warmup_users = list(dict.fromkeys([selected_user, "Overall"] + warmup.busiest_users(df)))
+        warmup.pool.submit(view_key, selection.warmup_tasks(df, warmup_users, aggregates, view_key,
+                                                            'dark' if is_dark else 'light'))
+        render_warmup_progress(lambda: warmup.pool.progress(view_key))
+
+    if store.ENABLED:
+        with st.sidebar.expander("🗄️ Stored chats"):
+            st.dataframe(store.chats(), hide_index=True)
+
     col1, col2 = st.sidebar.columns([1, 1])
     with col1:
         if st.button("🔍 Show Analysis"):
             st.session_state.analysis_requested = True
             st.session_state.analysis_ready = True
+            st.session_state.warmup_paused = False
     with col2:
         if st.button("❌ Clear Selection"):
             st.session_state.analysis_requested = False
             st.session_state.analysis_ready = False
+            # Nothing is prepared in the background until analysis is requested again
+            warmup.pool.cancel(view_key)
+            st.session_state.warmup_paused = True
             st.success("Selection cleared. Please upload a file and select options again.")
             st.rerun()
 
@@ -117,8 +204,6 @@ if uploaded_file and st.session_state.analysis_requested:
     selected_section = render_navbar()
     st.markdown('</div>', unsafe_allow_html=True)
 
-    st.write(f"🛠️ DEBUG: Selected section: {selected_section}")
-
     if not selected_section:
         st.markdown("""
             <div class="placeholder-section">
@@ -129,24 +214,38 @@ if uploaded_file and st.session_state.analysis_requested:
 
     elif st.session_state.analysis_ready:
         st.markdown('<div class="fade-in" id="analysis-section">', unsafe_allow_html=True)
+        # A section still queued for warm-up is computed here and now instead
+        claim_user = "Overall" if selected_section == "💬 Conversations" else selected_user
+        with warmup.pool.claim(view_key, claim_user, selected_section):
+            if selected_section == "🧠 Mood Analysis":
+                selection.show_mood_analysis(df, selected_user, view_key)
 
-        if selected_section == "🧠 Mood Analysis":
-            selection.show_mood_analysis(df, selected_user)
+            elif selected_section == "☁️ Word Cloud":
+                selection.show_wordcloud(df, selected_user, view_key, 'dark' if is_dark else 'light')
 
-        elif selected_section == "☁️ Word Cloud":
-            selection.show_wordcloud(df, selected_user)
+            elif selected_section == "📊 Content Stats":
+                selection.show_stats(df, selected_user, aggregates, view_key)
 
-        elif selected_section == "📊 Content Stats":
-            selection.show_stats(df, selected_user)
+            elif selected_section == "😀 Emoji Analysis":
+                selection.show_emoji_analysis(df, selected_user, view_key)
 
-        elif selected_section == "😀 Emoji Analysis":
-            selection.show_emoji_analysis(df, selected_user)
+            elif selected_section == "🤖 AI Mood Advice":
+                selection.show_ai_advice(df, selected_user, view_key)
 
-        elif selected_section == "🤖 AI Mood Advice":
-            selection.show_ai_advice(df, selected_user)
+            elif selected_section == "💬 Conversations":
+                selection.show_conversations(df, selected_user, view_key)
 
-        else:
-            st.warning("❗ Unknown section selected.")
+            elif selected_section == "🔎 Search":
+                # The index is stored next to the cached frame and loaded once per chat
+                profiling.count("session search index", st.session_state.get('search_index_key') == chat_key)
+                if st.session_state.get('search_index_key') != chat_key:
+                    with st.spinner("Indexing messages..."):
+                        st.session_state.search_index = search.load_or_build_index(chat_key, chat_df)
+                    st.session_state.search_index_key = chat_key
+                selection.show_search(chat_df, selected_user, st.session_state.search_index, (start, end))
+
+            else:
+                st.warning("❗ Unknown section selected.")
 
         # Always close the section
         st.markdown('</div>', unsafe_allow_html=True)
@@ -174,6 +273,10 @@ elif uploaded_file and not st.session_state.analysis_ready:
         </div>
     """, unsafe_allow_html=True)
 
+# --- Profiling Panel ---
+if profile is not None:
+    render_profiling_panel(profile.stop(), cache.results.stats())
+
 # --- Footer ---
 st.markdown("""
     <div style="position: fixed; bottom: 0; width: 100%; text-align: center; color: gray;">
@@ -0,0 +1,259 @@
+# bench.py
+#
+# Measures how long the app modules take to import, then times and
+# memory-profiles the parser and every public helper function on
+# synthetic chats of several sizes, and writes the results as JSON so runs can
+# be compared:
+#
+#     python bench.py --sizes 10000 100000 1000000 --out bench_results.json
+#     python bench.py --sizes 100000 --compare bench_results.json
+
+import argparse
+import inspect
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# Keep benchmark artefacts (word cloud PNGs, cubes) out of the app's cache
+os.environ.setdefault("CHAT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "whatsapp_bench_cache"))
+# ...and the stored benchmark chats out of the app's message store
+BENCH_STORE = os.path.join(tempfile.gettempdir(), "whatsapp_bench_store.sqlite")
+
+import pandas as pd
+import conversations
+import helper
+import preprocess
+import store
+import synthetic
+
+# helper functions that are not benchmarked, with the reason
+SKIPPED = {
+    'get_conversation_advice': "calls the remote LLM API",
+    'prefetch_conversation_advice': "calls the remote LLM API",
+    'stream_conversation_advice': "calls the remote LLM API",
+}
+
+def _last_month(df):
+    last = df['date'].max().date()
+    return last - timedelta(days=30), last
+
+
+def _stored(df):
+    # Stored once per chat size, normally already by the store_load_chat case
+    key = f"bench-{len(df)}"
+    if not store.has_chat(key, path=BENCH_STORE):
+        store.load_chat(key, df, path=BENCH_STORE)
+    return key
+
+
+# Whole-chat stages: name -> callable(df)
+CHAT_CASES = {
+    'count_links': helper.count_links,
+    'tokenize_words': helper.tokenize_words,
+    'tokenize_emojis': helper.tokenize_emojis,
+    'score_sentiment': helper.score_sentiment,
+    'build_cube': helper.build_cube,
+    'merge_cubes': lambda df: helper.merge_cubes(helper.build_cube(df), helper.build_cube(df)),
+    'aggregates_from_cube': lambda df: helper.aggregates_from_cube(helper.build_cube(df)),
+    'build_aggregates': helper.build_aggregates,
+    'load_or_build_aggregates': lambda df: helper.load_or_build_aggregates(f"bench-{time.time_ns()}", df),
+    'load_or_build_cube': lambda df: helper.load_or_build_cube(f"bench-{time.time_ns()}", df),
+    'cube_date_slice': lambda df: helper.cube_date_slice(helper.build_cube(df), *_last_month(df)),
+    'sort_by_date': helper.sort_by_date,
+    'date_slice': lambda df: helper.date_slice(df, *_last_month(df)),
+    'most_busy_users': helper.most_busy_users,
+    'conversations': lambda df: conversations.analyze(helper.sort_by_date(df)),
+    'store_load_chat': lambda df: store.load_chat(f"bench-{len(df)}", df, path=BENCH_STORE),
+    'store_most_busy_users': lambda df: store.most_busy_users(_stored(df), path=BENCH_STORE),
+}
+
+# Per-user functions, run for 'Overall' and the busiest user: name -> callable(df, user)
+USER_CASES = {
+    'fetch_stats': lambda df, user: helper.fetch_stats(user, df),
+    'word_frequencies': lambda df, user: helper.word_frequencies(user, df),
+    'create_wordcloud': lambda df, user: helper.create_wordcloud(user, df),
+    'wordcloud_png': lambda df, user: helper.wordcloud_png(f"bench-{time.time_ns()}", user, df),
+    'most_common_words': lambda df, user: helper.most_common_words(user, df),
+    'emoji_helper': lambda df, user: helper.emoji_helper(user, df),
+    'monthly_timeline': lambda df, user: helper.monthly_timeline(user, df),
+    'daily_timeline': lambda df, user: helper.daily_timeline(user, df),
+    'week_activity_map': lambda df, user: helper.week_activity_map(user, df),
+    'month_activity_map': lambda df, user: helper.month_activity_map(user, df),
+    'activity_heapmap': lambda df, user: helper.activity_heapmap(user, df),
+    'extract_mood_counts': lambda df, user: helper.extract_mood_counts(user, df),
+    'sentiment_analysis': lambda df, user: helper.sentiment_analysis(user, df),
+    'detect_dominant_emotion': lambda df, user: helper.detect_dominant_emotion(user, df),
+    'advice_prompt': lambda df, user: helper.advice_prompt(user, df),
+    # Every timeline and stats aggregation, as SQL on the stored chat
+    'store_aggregates': lambda df, user: dict(store.aggregates(_stored(df), path=BENCH_STORE)[user]),
+}
+
+
+def public_helpers():
+    return sorted(
+        name for name, obj in vars(helper).items()
+        if inspect.isfunction(obj) and obj.__module__ == helper.__name__ and not name.startswith('_')
+    )
+
+
+def measure(func, repeat, setup=lambda: ()):
+    """Return (best wall seconds over ``repeat`` runs, peak traced MB of one extra run).
+
+    ``setup()`` runs untimed before every call and returns its arguments.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        args = setup()
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    # Memory is traced in a separate run because tracemalloc slows code down
+    args = setup()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1e6
+
+
+# Imports the modules app.py needs before it can draw the landing page, in a
+# fresh interpreter. Streamlit itself is imported first and not counted.
+STARTUP_SCRIPT = """
+import time
+import streamlit
+started = time.perf_counter()
+import cache, helper, layout, profiling, search, selection
+print(time.perf_counter() - started)
+"""
+
+
+def measure_startup(repeat):
+    """Return the best time over ``repeat`` fresh interpreters to import the app's modules."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    return min(
+        float(subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=here, check=True,
+                             capture_output=True, text=True).stdout)
+        for _ in range(repeat)
+    )
+
+
+def _object_layout(df):
+    # The frame as it was stored before the compact layout: object strings,
+    # int64 calendar fields and every derived column materialized
+    df = preprocess.with_columns(df, *preprocess.DERIVED_COLUMNS)
+    df['only_date'] = df['date'].dt.date
+    return df.astype({name: 'int64' if name != 'user' else object for name in preprocess.COMPACT_DTYPES})
+
+
+def chat_file(size, users, data_dir):
+    path = pathlib.Path(data_dir) / f"synthetic-{size}-{users}u.txt"
+    if not path.exists():
+        synthetic.write_chat(path, size, users=users)
+    return path
+
+
+def run(sizes, users, repeat, functions, data_dir):
+    seconds = measure_startup(repeat)
+    results = [{'size': None, 'function': 'startup', 'user': None, 'seconds': seconds, 'peak_mb': None}]
+    print(f"== app startup\n  {'import app modules':<28} {'':<8} {seconds:9.3f}s")
+    for size in sizes:
+        path = chat_file(size, users, data_dir)
+        print(f"== {size} messages ({path.stat().st_size / 1e6:.1f} MB)")
+
+        seconds, peak_mb = measure(lambda: preprocess.preprocess(path), repeat)
+        results.append({'size': size, 'function': 'preprocess', 'user': None, 'seconds': seconds, 'peak_mb': peak_mb})
+        print(f"  {'preprocess':<28} {'':<8} {seconds:9.3f}s {peak_mb:9.1f} MB")
+
+        df = preprocess.preprocess(path)
+        for layout, frame in (('object', _object_layout(df)), ('compact', df)):
+            report = preprocess.memory_report(frame)
+            per_message = report.loc['total', 'bytes_per_message']
+            results.append({'size': size, 'function': f'memory:{layout}', 'user': None, 'seconds': None,
+                            'peak_mb': report.loc['total', 'bytes'] / 1e6, 'bytes_per_message': per_message})
+            print(f"  {'frame (' + layout + ' layout)':<28} {'':<8} {per_message:9.1f} B/message")
+        busiest = df.loc[df['user'] != 'group_notification', 'user'].value_counts().index[0]
+        # Every call gets a fresh copy of the parsed frame, so per-message
+        # results memoized by earlier calls do not leak into the timings
+        for name in functions:
+            if name in CHAT_CASES:
+                cases = [(None, lambda frame, name=name: CHAT_CASES[name](frame))]
+            else:
+                cases = [(user, lambda frame, name=name, user=user: USER_CASES[name](frame, user))
+                         for user in ('Overall', busiest)]
+            for user, func in cases:
+                seconds, peak_mb = measure(func, repeat, setup=lambda: (df.copy(),))
+                results.append({'size': size, 'function': name, 'user': user, 'seconds': seconds, 'peak_mb': peak_mb})
+                print(f"  {name:<28} {user or '':<8} {seconds:9.3f}s {peak_mb:9.1f} MB")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['size'], r['function'], r['user']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path} (time ratio > 1 means slower now):")
+    for r in results:
+        old = baseline.get((r['size'], r['function'], r['user']))
+        if old and old['seconds']:
+            ratio = r['seconds'] / old['seconds']
+            flag = "  ⚠️ regression" if ratio > 1.2 else ""
+            print(f"  {str(r['size']):>9} {r['function']:<28} {str(r['user']):<8} x{ratio:5.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark preprocess and helper functions on synthetic chats.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help="messages per chat (10k-10M)")
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, the best one is kept")
+    cases = sorted(set(CHAT_CASES) | set(USER_CASES))
+    parser.add_argument('--functions', nargs='+', choices=cases, default=cases)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), "whatsapp_bench_chats"))
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    missing = set(public_helpers()) - set(CHAT_CASES) - set(USER_CASES) - set(SKIPPED)
+    if missing:
+        print(f"⚠️ Public helper functions without a benchmark case: {', '.join(sorted(missing))}", file=sys.stderr)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = run(args.sizes, args.users, args.repeat, args.functions, args.data_dir)
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'users': args.users,
+                'repeat': args.repeat,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
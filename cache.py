@@ -0,0 +1,303 @@
+# cache.py
+
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+import preprocess
+import profiling
+
+# Parsed chats are stored as Parquet files named after the SHA-256 of the
+# uploaded bytes, so the same export always maps to the same entry.
+CACHE_DIR = os.getenv("CHAT_CACHE_DIR", os.path.join(os.getcwd(), ".chat_cache"))
+CACHE_MAX_BYTES = int(os.getenv("CHAT_CACHE_MAX_BYTES", 1024 ** 3))
+
+# Bump whenever the layout of the parsed frame changes to invalidate old entries
+CACHE_VERSION = 3
+
+# Exports sharing their first PREFIX_BYTES are candidates for incremental
+# ingestion: a newer export of a chat is the older one plus new messages.
+PREFIX_BYTES = 64 * 1024
+
+_BLOCK_SIZE = 1024 * 1024
+
+
+def _open_binary(source):
+    """Return ``(file, close)`` for reading ``source`` as bytes from the start."""
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), lambda: None
+    if isinstance(source, os.PathLike):
+        f = open(source, 'rb')
+        return f, f.close
+    position = source.tell()
+    source.seek(0)
+    return source, lambda: source.seek(position)
+
+
+def _hash_stream(f, length=None):
+    digest = hashlib.sha256()
+    remaining = length
+    while remaining is None or remaining > 0:
+        block = f.read(_BLOCK_SIZE if remaining is None else min(_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        digest.update(block)
+        if remaining is not None:
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def chat_hash(source, length=None):
+    """Return the hex SHA-256 of a chat export (or of its first ``length`` bytes).
+
+    ``source`` may be text, bytes, a path or a binary buffer.
+    """
+    f, close = _open_binary(source)
+    try:
+        return _hash_stream(f, length)
+    finally:
+        close()
+
+
+def cache_path(key, suffix='.parquet'):
+    return os.path.join(CACHE_DIR, f"v{CACHE_VERSION}-{key}{suffix}")
+
+
+def load_frame(key, suffix='.parquet'):
+    path = cache_path(key, suffix)
+    try:
+        df = pd.read_parquet(path)
+    except (FileNotFoundError, OSError, ValueError):
+        profiling.count(f"disk {suffix}", False)
+        return None
+    profiling.count(f"disk {suffix}", True)
+    # Touch the entry so eviction drops the least recently used chats first
+    os.utime(path)
+    return df
+
+
+def store_frame(key, df, suffix='.parquet'):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(key, suffix)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    evict()
+
+
+def load_bytes(key, suffix):
+    path = cache_path(key, suffix)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        profiling.count(f"disk {suffix}", False)
+        return None
+    profiling.count(f"disk {suffix}", True)
+    os.utime(path)
+    return data
+
+
+def store_bytes(key, data, suffix):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(key, suffix)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    evict()
+
+
+def evict(max_bytes=None):
+    """Delete least recently used cache entries until the directory fits in ``max_bytes``."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.is_file() and not e.name.endswith('.tmp')]
+    except FileNotFoundError:
+        return
+    entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def load_meta(key):
+    data = load_bytes(key, '.json')
+    return None if data is None else json.loads(data)
+
+
+def store_meta(key, meta):
+    store_bytes(key, json.dumps(meta).encode('utf-8'), '.json')
+
+
+def _parse_increment(f, size, prefix):
+    """Parse only the new tail of ``f`` if it extends a cached export.
+
+    Returns ``(df, meta)`` or ``None`` when no cached base matches.
+    """
+    lineage = load_meta('prefix-' + hashlib.sha256(prefix).hexdigest())
+    base = lineage and load_meta(lineage['key'])
+    if not base or not PREFIX_BYTES <= base['length'] < size or 'header_format' not in base:
+        return None
+    header_format = preprocess.make_header_format(*base['header_format'])
+
+    # The old export must be a byte-exact prefix ending on a line break, and
+    # the tail must start a new message rather than continue the last one.
+    f.seek(0)
+    if _hash_stream(f, base['length']) != lineage['key']:
+        return None
+    f.seek(base['length'] - 1)
+    boundary = f.read(256)
+    if not boundary.startswith(b'\n') or not header_format.pattern.match(boundary[1:].decode('utf-8', 'ignore')):
+        return None
+    base_df = load_frame(lineage['key'])
+    if base_df is None or len(base_df) != base['rows']:
+        return None
+
+    # Parse the tail with the base's format; a short tail alone could be
+    # ambiguous (e.g. day/month order when every day is <= 12)
+    f.seek(base['length'])
+    tail_df = preprocess.preprocess(f, header_format=header_format)
+    df = preprocess.compact(pd.concat([base_df, tail_df], ignore_index=True))
+    return df, {'base': lineage['key'], 'base_rows': len(base_df), 'header_format': [header_format.name, header_format.date_format]}
+
+
+def parse_cached(source, key=None):
+    """Return ``(key, df)`` for a chat export, parsing it only on a cache miss.
+
+    A newer export of an already cached chat is recognised by its leading
+    bytes; only the messages appended since then are parsed and added to the
+    cached frame. ``load_meta(key)`` records the base chat in that case.
+    """
+    if key is None:
+        key = chat_hash(source)
+    df = load_frame(key)
+    if df is not None:
+        return key, df
+
+    f, close = _open_binary(source)
+    try:
+        size = f.seek(0, io.SEEK_END)
+        f.seek(0)
+        prefix = f.read(PREFIX_BYTES)
+        increment = _parse_increment(f, size, prefix) if len(prefix) == PREFIX_BYTES else None
+        if increment is not None:
+            df, meta = increment
+        else:
+            sample = prefix.decode('utf-8', 'ignore').splitlines(True)[:preprocess.SAMPLE_LINES]
+            header_format = preprocess.detect_format(sample)
+            f.seek(0)
+            df = preprocess.preprocess(f, header_format=header_format)
+            meta = {'header_format': [header_format.name, header_format.date_format]}
+    finally:
+        close()
+
+    store_frame(key, df)
+    store_meta(key, dict(meta, length=size, rows=len(df)))
+    if len(prefix) == PREFIX_BYTES:
+        store_meta('prefix-' + hashlib.sha256(prefix).hexdigest(), {'key': key})
+    return key, df
+
+
+# ----------------- In-memory results -----------------
+
+# Budget for analysis results kept in memory, shared by all sessions of the
+# server process; least recently used results are dropped first.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+
+
+def _sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if hasattr(value, 'to_plotly_json'):
+        # A plotly figure holds its data in nested dicts; its JSON is a fair estimate
+        return len(value.to_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU of computed results, bounded by their estimated size in bytes.
+
+    Cached values are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        profiling.count("memory results", entry is not None)
+        if entry is not None:
+            return entry[0]
+
+        # Computed outside the lock so other sessions are not blocked meanwhile
+        value = compute()
+        size = _sizeof(value)
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+results = ResultCache(RESULT_CACHE_MAX_BYTES)
+
+
+def cached_result(chat_key, selected_user, section, compute, **params):
+    """Return ``compute()``, reusing the result for the same chat, user, section and params.
+
+    Without a ``chat_key`` the result is computed every time.
+    """
+    if chat_key is None:
+        return compute()
+    return results.get_or_compute((chat_key, selected_user, section, tuple(sorted(params.items()))), compute)
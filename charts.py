@@ -0,0 +1,87 @@
+# charts.py
+#
+# Chart data layer for the stats section: long series are reduced on the
+# server before they are sent to the browser, large ones are drawn with WebGL
+# traces, and figures are plain plotly objects that can be cached.
+
+import numpy as np
+import pandas as pd
+
+# Most points a line chart is sent; longer series are resampled or reduced
+MAX_POINTS = 1000
+# Series longer than this are drawn with WebGL (scattergl) instead of SVG
+WEBGL_POINTS = 500
+# Markers are only drawn on short series, where they are still readable
+MARKER_POINTS = 120
+
+
+def lttb(x, y, threshold):
+    """Return the indices of the ``threshold`` points kept by largest-triangle-three-buckets.
+
+    ``x`` must be increasing. The first and last points are always kept; from
+    every bucket in between the point forming the largest triangle with the
+    previously kept point and the average of the next bucket is chosen.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+
+def downsample_daily(daily, max_points=MAX_POINTS):
+    """Reduce a ``daily_timeline`` frame to at most about ``max_points`` rows.
+
+    Returns ``(frame, granularity)``. Up to ``max_points`` days are kept as
+    they are; up to ``max_points`` weeks are summed per week, which keeps
+    totals meaningful; longer histories keep the days picked by LTTB, which
+    preserves the peaks.
+    """
+    if len(daily) <= max_points:
+        return daily, 'day'
+    dates = pd.to_datetime(daily['only_date'])
+    if (dates.iloc[-1] - dates.iloc[0]).days // 7 < max_points:
+        weekly = daily['message'].groupby(dates.dt.to_period('W').dt.start_time).sum()
+        return weekly.rename_axis('only_date').reset_index(), 'week'
+    kept = lttb(dates.to_numpy().astype('datetime64[ns]').astype(np.int64), daily['message'].to_numpy(), max_points)
+    return daily.iloc[kept], 'day (downsampled)'
+
+
+def line_figure(frame, x, y, title):
+    """Return a plotly line chart, switching to WebGL and dropping markers for long series."""
+    import plotly.express as px
+    return px.line(
+        frame, x=x, y=y, title=title,
+        markers=len(frame) <= MARKER_POINTS,
+        render_mode='webgl' if len(frame) > WEBGL_POINTS else 'svg',
+    )
+
+
+def daily_timeline_figure(daily, max_points=MAX_POINTS):
+    frame, granularity = downsample_daily(daily, max_points)
+    title = 'Daily Message Count' if granularity == 'day' else f'Message Count per {granularity}'
+    return line_figure(frame, 'only_date', 'message', title)
+
+
+def heatmap_figure(heatmap):
+    """Return an interactive plotly heatmap of an ``activity_heapmap`` table."""
+    import plotly.express as px
+    fig = px.imshow(heatmap, aspect='auto', color_continuous_scale='Magma',
+                    labels={'x': 'Hour', 'y': 'Day', 'color': 'Messages'})
+    fig.update_xaxes(type='category')
+    return fig
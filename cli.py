@@ -0,0 +1,179 @@
+# cli.py
+#
+# Headless batch analysis of WhatsApp chat exports, without Streamlit:
+#
+#     python cli.py exports/ --out results/
+#     python cli.py "exports/**/*.txt" --out results/ --workers 8 --format json
+#     python cli.py exports/ --store chats.sqlite
+#
+# Every chat gets its own directory under --out. A chat whose source file has
+# not changed since its last successful run is skipped, so an interrupted run
+# resumes where it stopped. With --store every analyzed chat is also saved to
+# that SQLite message store (see store.py) for querying and comparing later.
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Bump whenever the set or layout of the written results changes
+RESULTS_VERSION = 1
+
+DONE_MARKER = '_SUCCESS.json'
+
+
+def find_chats(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*.txt')
+        paths.extend(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(set(os.path.abspath(p) for p in paths))
+
+
+def chat_output_dir(out_root, path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_root, f"{stem}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}")
+
+
+def _source_signature(path, fmt='parquet', store_path=None):
+    # The output options are part of it: a run in another format or with a
+    # store writes results the previous run did not
+    stat = os.stat(path)
+    return {'source': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': RESULTS_VERSION,
+            'format': fmt, 'store': os.path.abspath(store_path) if store_path else None}
+
+
+def is_up_to_date(path, out_dir, fmt='parquet', store_path=None):
+    try:
+        with open(os.path.join(out_dir, DONE_MARKER), encoding='utf-8') as f:
+            done = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    return all(done.get(k) == v for k, v in _source_signature(path, fmt, store_path).items())
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _write_table(out_dir, name, table, fmt):
+    path = os.path.join(out_dir, f"{name}.{fmt}")
+    tmp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        table.to_parquet(tmp_path, index=False)
+    else:
+        table.to_json(tmp_path, orient='records', force_ascii=False, date_format='iso')
+    os.replace(tmp_path, path)
+
+
+def analyze_chat(path, out_dir, fmt='parquet', store_path=None):
+    """Analyze one export and write its results; returns ``(messages, bytes)``."""
+    import pandas as pd
+    import cache
+    import helper
+    import preprocess
+    import store
+
+    # A plain str would be taken as the chat text itself
+    df = preprocess.preprocess(pathlib.Path(path))
+    if store_path:
+        chat_key = cache.chat_hash(pathlib.Path(path))
+        store.load_chat(chat_key, df, name=os.path.basename(path), path=store_path)
+    aggregates = helper.build_aggregates(df)
+    helper.score_sentiment(df, processes=1)
+    users = sorted(u for u in df['user'].unique() if u != 'group_notification')
+
+    summary = {}
+    tables = {'monthly_timeline': [], 'daily_timeline': [], 'emoji': [], 'words': []}
+    for user in ['Overall'] + users:
+        num_messages, num_words, num_media, num_links = helper.fetch_stats(user, df, aggregates)
+        summary[user] = {
+            'messages': num_messages,
+            'words': num_words,
+            'media': num_media,
+            'links': num_links,
+            'sentiment': helper.sentiment_analysis(user, df),
+            'dominant_emotion': helper.detect_dominant_emotion(user, df),
+            'moods': dict(helper.extract_mood_counts(user, df)),
+            'busiest_day': next(iter(helper.week_activity_map(user, df, aggregates).index), None),
+            'busiest_month': next(iter(helper.month_activity_map(user, df, aggregates).index), None),
+        }
+        tables['monthly_timeline'].append(helper.monthly_timeline(user, df, aggregates).assign(user=user))
+        tables['daily_timeline'].append(helper.daily_timeline(user, df, aggregates).assign(user=user))
+        tables['emoji'].append(helper.emoji_helper(user, df).rename(columns={0: 'emoji', 1: 'count'}).assign(user=user))
+        tables['words'].append(helper.most_common_words(user, df).rename(columns={0: 'word', 1: 'count'}).assign(user=user))
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, parts in tables.items():
+        table = pd.concat(parts, ignore_index=True)
+        if 'only_date' in table.columns:
+            table['only_date'] = table['only_date'].astype(str)
+        _write_table(out_dir, name, table, fmt)
+    if store_path:
+        busy, _ = store.most_busy_users(chat_key, path=store_path)
+    else:
+        busy, _ = helper.most_busy_users(df[df['user'] != 'group_notification'])
+    _write_json(os.path.join(out_dir, 'stats.json'), {
+        'source': path,
+        'first_message': df['date'].min() if len(df) else None,
+        'last_message': df['date'].max() if len(df) else None,
+        'busiest_users': busy.to_dict(),
+        'users': summary,
+    })
+    # Written last: its presence marks the chat as complete for resuming
+    _write_json(os.path.join(out_dir, DONE_MARKER), dict(_source_signature(path, fmt, store_path), messages=len(df)))
+    return len(df), os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or glob of WhatsApp chat exports.")
+    parser.add_argument('inputs', nargs='+', help="directories (searched recursively) or glob patterns of .txt exports")
+    parser.add_argument('--out', default='results', help="output directory (default: results)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument('--format', choices=['parquet', 'json'], default='parquet', help="format of the result tables")
+    parser.add_argument('--force', action='store_true', help="reprocess chats that are already up to date")
+    parser.add_argument('--store', metavar='PATH', help="also save the chats to this SQLite message store")
+    args = parser.parse_args(argv)
+
+    chats = find_chats(args.inputs)
+    pending = [p for p in chats
+               if args.force or not is_up_to_date(p, chat_output_dir(args.out, p), args.format, args.store)]
+    print(f"Found {len(chats)} chats, {len(chats) - len(pending)} up to date, {len(pending)} to analyze")
+
+    started = time.perf_counter()
+    total_messages = total_bytes = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(analyze_chat, p, chat_output_dir(args.out, p), args.format, args.store): p for p in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                messages, size = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(pending)}] ❌ {path}: {e}", file=sys.stderr)
+                continue
+            total_messages += messages
+            total_bytes += size
+            print(f"[{done}/{len(pending)}] {path}: {messages} messages")
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"Analyzed {len(pending) - failed} chats ({total_messages} messages, {total_bytes / 1e6:.1f} MB) "
+        f"in {elapsed:.1f}s: {(len(pending) - failed) / elapsed:.2f} chats/s, "
+        f"{total_messages / elapsed:.0f} messages/s, {total_bytes / 1e6 / elapsed:.2f} MB/s"
+        + (f", {failed} failed" if failed else "")
+    )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# conversations.py
+#
+# Conversation sessions and reply latencies of a parsed chat. Everything is
+# computed in O(n) from the date-sorted ``date`` and ``user`` columns with
+# NumPy diffs and shifts, without a Python loop over the messages.
+#
+# A session is a run of messages with no pause longer than the idle gap; its
+# first author is the initiator. A reply is a message whose author differs
+# from the author of the message right before it in the same session, and
+# its latency is the time between the two. Exports only keep minutes, so
+# replies within the same minute have a latency of 0.
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Pause after which the next message starts a new session
+SESSION_GAP = pd.Timedelta(minutes=30)
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+ConversationStats = namedtuple('ConversationStats', ['sessions', 'latencies', 'initiators', 'reply_matrix'])
+
+
+def _messages(df):
+    # Notifications are not part of a conversation
+    df = df[df['user'] != 'group_notification']
+    codes, users = pd.factorize(df['user'])
+    dates = df['date'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    return codes, np.asarray(users, dtype=object), dates
+
+
+def session_starts(dates, gap=SESSION_GAP):
+    """Return a boolean array marking the messages that open a new session."""
+    starts = np.ones(len(dates), dtype=bool)
+    starts[1:] = np.diff(dates) > pd.Timedelta(gap).total_seconds()
+    return starts
+
+
+def analyze(df, gap=SESSION_GAP):
+    """Segment a date-sorted chat into sessions and measure who replies to whom and how fast.
+
+    Returns a ConversationStats of:
+
+    - ``sessions``: one row per session with start, end, messages, initiator
+      and closer;
+    - ``latencies``: per user, the number of replies and their latency
+      percentiles in seconds;
+    - ``initiators``: sessions started per user, descending;
+    - ``reply_matrix``: replies counted per (replying user, replied-to user).
+    """
+    codes, users, dates = _messages(df)
+    n_users = len(users)
+    starts = session_starts(dates, gap)
+    session_ids = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:] - 1, len(dates) - 1) if len(first) else first
+
+    sessions = pd.DataFrame({
+        'start': pd.to_datetime(dates[first], unit='s'),
+        'end': pd.to_datetime(dates[last], unit='s'),
+        'messages': np.diff(np.append(first, len(dates))),
+        'initiator': users[codes[first]],
+        'closer': users[codes[last]],
+    })
+
+    # A reply continues a session with a different author than the previous message
+    replies = np.flatnonzero(~starts & (codes != np.roll(codes, 1)))
+    responders, addressees = codes[replies], codes[replies - 1]
+    latency = dates[replies] - dates[replies - 1]
+
+    order = np.argsort(responders, kind='stable')
+    bounds = np.searchsorted(responders[order], np.arange(n_users + 1))
+    rows = []
+    for code in range(n_users):
+        user_latency = latency[order[bounds[code]:bounds[code + 1]]]
+        if len(user_latency):
+            percentiles = np.percentile(user_latency, LATENCY_PERCENTILES)
+        else:
+            percentiles = [np.nan] * len(LATENCY_PERCENTILES)
+        rows.append([users[code], len(user_latency), user_latency.mean() if len(user_latency) else np.nan, *percentiles])
+    latencies = pd.DataFrame(rows, columns=['user', 'replies', 'mean'] + [f"p{p}" for p in LATENCY_PERCENTILES])
+    latencies = latencies.sort_values('replies', ascending=False, ignore_index=True)
+
+    initiators = pd.Series(
+        np.bincount(codes[first], minlength=n_users), index=pd.Index(users, name='user'), name='sessions'
+    ).sort_values(ascending=False)
+
+    matrix = np.bincount(responders * n_users + addressees, minlength=n_users * n_users).reshape(n_users, n_users)
+    reply_matrix = pd.DataFrame(matrix, index=pd.Index(users, name='from'), columns=pd.Index(users, name='to'))
+
+    return ConversationStats(sessions, latencies, initiators, reply_matrix)
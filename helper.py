@@ -1,111 +1,457 @@
-from urlextract import URLExtract
-from wordcloud import WordCloud
+import numpy as np
 import pandas as pd
-from collections import Counter
-import emoji
-from textblob import TextBlob
-import requests
+from collections import Counter, namedtuple
+from itertools import chain
+import re
+import io
+import hashlib
+import weakref
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import os
-from dotenv import load_dotenv
+import threading
+from preprocess import PERIOD_LABELS
+import preprocess
+import cache
+
+# URL extraction, word clouds, emoji data, sentiment models and the HTTP
+# client are imported on first use, so the app starts without loading the
+# ones a session never needs. The objects built from them are process-wide
+# singletons shared by every session.
+
+
+@functools.lru_cache(maxsize=None)
+def url_extractor():
+    from urlextract import URLExtract
+    return URLExtract()
+
+# Per-message results (tokens, links, emojis, sentiment) are computed once per
+# frame and kept next to it for as long as it is alive, never added to it as
+# columns: sessions and the background warm-up read the same frame at once,
+# and pandas does not support changing a frame while other threads read it.
+# The first caller computes a result under the lock of that frame and name,
+# concurrent callers wait for it.
+_frame_results = {}  # (id(df), name) -> result
+_frame_locks = {}  # (id(df), name) -> lock
+_frame_locks_guard = threading.Lock()
+
+
+def _memoized_on_frame(name):
+    # Keeps the result of the decorated func(df, ...) for df under ``name``
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(df, *args, **kwargs):
+            key = (id(df), name)
+            with _frame_locks_guard:
+                lock = _frame_locks.get(key)
+                if lock is None:
+                    lock = _frame_locks[key] = threading.Lock()
+                    weakref.finalize(df, _frame_locks.pop, key, None)
+                    weakref.finalize(df, _frame_results.pop, key, None)
+            with lock:
+                if key not in _frame_results:
+                    _frame_results[key] = func(df, *args, **kwargs)
+                return _frame_results[key]
+        return wrapper
+    return decorate
+
+MEDIA_MESSAGE = '<Media omitted>\n'
+
+# A message can only contain a URL if it has a scheme, a dot followed by a
+# letter (the start of a TLD) or a dot between digits (an IPv4 address);
+# everything else skips URLExtract entirely. The pattern runs on Python
+# strings: Arrow-backed regexes match only ASCII with \w, missing TLDs like .рф.
+URL_CANDIDATE_PATTERN = re.compile(r'://|\.[^\W\d_]|\d\.\d')
+
+
+@_memoized_on_frame('links')
+def count_links(df):
+    """Return the number of URLs in each message of ``df``, computed once per frame."""
+    messages = df['message']
+    candidates = messages.astype(object).str.contains(URL_CANDIDATE_PATTERN)
+    links = pd.Series(0, index=df.index, dtype='int64')
+    links[candidates] = messages[candidates].map(lambda message: len(url_extractor().find_urls(message)))
+    return links.rename('links')
+
+
+# ----------------- Aggregate Cube -----------------
+
+CUBE_KEYS = ['user', 'only_date', 'hour']
+
+
+def build_cube(df):
+    """Group the chat once by (user, date, hour) with message, word, media and link totals."""
+    tokens = tokenize_words(df)
+    messages = df['message']
+    per_message = pd.DataFrame({
+        'user': df['user'],
+        'only_date': preprocess.column(df, 'only_date'),
+        'hour': df['hour'],
+        'messages': 1,
+        'words': np.diff(tokens.offsets),
+        'media': messages == MEDIA_MESSAGE,
+        'links': count_links(df),
+    })
+    return per_message.groupby(CUBE_KEYS, sort=False, observed=True).sum().reset_index()
+
+
+def merge_cubes(*cubes):
+    return pd.concat(cubes, ignore_index=True).groupby(CUBE_KEYS, sort=False, observed=True).sum().reset_index()
+
+
+def aggregates_from_cube(cube):
+    """Derive every timeline/stats result for each user and 'Overall' from a cube.
+
+    Returns ``{user: {function_name: result}}`` where each result has the same
+    shape as the matching helper function.
+    """
+    cube = cube.copy()
+    dates = pd.to_datetime(cube['only_date'])
+    cube['year'] = dates.dt.year
+    cube['month_num'] = dates.dt.month
+    cube['month'] = dates.dt.month_name()
+    cube['day_name'] = dates.dt.day_name()
+    cube['period'] = PERIOD_LABELS[cube['hour'].to_numpy()]
+
+    aggregates = {'Overall': _aggregate_cube(cube)}
+    for user, user_cube in cube.groupby('user', sort=False, observed=True):
+        aggregates[user] = _aggregate_cube(user_cube)
+    return aggregates
+
+
+def build_aggregates(df):
+    """Precompute every timeline/stats result for each user and 'Overall'.
+
+    Every chart is derived from the small (user, date, hour) cube instead of
+    re-filtering the full frame.
+    """
+    return aggregates_from_cube(build_cube(df))
+
+
+def load_or_build_cube(chat_key, df):
+    """Like ``build_cube`` but keeps the cube in the on-disk cache.
+
+    For a chat ingested incrementally only the appended rows are aggregated
+    and merged into the cube of the chat it extends.
+    """
+    cube = cache.load_frame(f"{chat_key}-cube")
+    if cube is None:
+        meta = cache.load_meta(chat_key) or {}
+        base_cube = cache.load_frame(f"{meta['base']}-cube") if meta.get('base') else None
+        if base_cube is not None:
+            cube = merge_cubes(base_cube, build_cube(df.iloc[meta['base_rows']:].copy()))
+        else:
+            cube = build_cube(df)
+        cache.store_frame(f"{chat_key}-cube", cube)
+    return cube
+
+
+def load_or_build_aggregates(chat_key, df):
+    """Like ``build_aggregates`` but keeps the cube in the on-disk cache."""
+    return aggregates_from_cube(load_or_build_cube(chat_key, df))
+
+
+def cube_date_slice(cube, start=None, end=None):
+    """Return the part of a cube between the inclusive dates ``start`` and ``end``."""
+    keep = pd.Series(True, index=cube.index)
+    if start is not None:
+        keep &= cube['only_date'] >= start
+    if end is not None:
+        keep &= cube['only_date'] <= end
+    return cube if keep.all() else cube[keep]
+
+
+def _aggregate_cube(cube):
+    totals = cube[['messages', 'words', 'media', 'links']].sum()
+
+    timeline = cube.groupby(['year', 'month_num', 'month'])['messages'].sum().reset_index()
+    timeline = timeline.rename(columns={'messages': 'message'})
+    timeline['time'] = timeline['month'] + "-" + timeline['year'].astype(str)
+
+    daily = cube.groupby('only_date')['messages'].sum().reset_index()
+    daily = daily.rename(columns={'messages': 'message'})
+
+    week = cube.groupby('day_name')['messages'].sum().sort_values(ascending=False).rename('count')
+    month = cube.groupby('month')['messages'].sum().sort_values(ascending=False).rename('count')
+
+    heatmap = cube.groupby(['day_name', 'period'])['messages'].sum().unstack('period', fill_value=0).astype(float)
+
+    return {
+        'fetch_stats': (int(totals['messages']), int(totals['words']), int(totals['media']), int(totals['links'])),
+        'monthly_timeline': timeline,
+        'daily_timeline': daily,
+        'week_activity_map': week,
+        'month_activity_map': month,
+        'activity_heapmap': heatmap,
+    }
+
+
+def _lookup(aggregates, selected_user, name):
+    # Users with no messages at all are not in the cube
+    if aggregates is None or selected_user not in aggregates:
+        return None
+    return aggregates[selected_user][name]
+
+
+# ----------------- Date Range -----------------
+
+def sort_by_date(df):
+    """Return ``df`` ordered by ``date``; exports are normally in order already and are returned as is."""
+    if df['date'].is_monotonic_increasing:
+        return df
+    return df.sort_values('date', kind='stable', ignore_index=True)
 
-# Load environment variables
-load_dotenv()
-api_key = os.getenv("OPENROUTER_API_KEY")
 
-extract = URLExtract()
+def date_slice(df, start=None, end=None):
+    """Return the messages of a date-sorted frame between the inclusive dates ``start`` and ``end``.
+
+    The bounds are found by binary search and the result is a positional
+    slice, not a filtered copy. The full range returns ``df`` itself, so
+    per-message results memoized for it are kept.
+    """
+    dates = df['date'].to_numpy()
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left'))
+    hi = len(df) if end is None else int(np.searchsorted(
+        dates, np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1)), side='left'))
+    if lo == 0 and hi == len(df):
+        return df
+    return df.iloc[lo:hi]
+
 
 # ----------------- Statistics -----------------
 
-def fetch_stats(selected_user, df):
+def fetch_stats(selected_user, df, aggregates=None):
+    cached = _lookup(aggregates, selected_user, 'fetch_stats')
+    if cached is not None:
+        return cached
+    links = count_links(df)
+    words = np.diff(tokenize_words(df).offsets)
     if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+        selected = (df['user'] == selected_user).to_numpy()
+        df = df[selected]
+        links = links[selected]
+        words = words[selected]
     num_messages = df.shape[0]
-    words = []
-    for message in df['message']:
-        words.extend(message.split())
-    num_media_messages = df[df['message'] == '<Media omitted>/n'].shape[0]
-    links = []
-    for message in df['message']:
-        links.extend(extract.find_urls(message))
+    num_words = int(words.sum())
+    num_media_messages = df[df['message'] == MEDIA_MESSAGE].shape[0]
+    num_links = int(links.sum())
 
-    return num_messages, len(words), num_media_messages, len(links)
+    return num_messages, num_words, num_media_messages, num_links
 
 
 def most_busy_users(df):
-    x = df['user'].value_counts().head()
-    df = round((df['user'].value_counts() / df.shape[0]) * 100, 2).reset_index().rename(columns={'index': 'name', 'user': 'percent'})
+    # Counted as plain strings: a categorical would also list authors filtered out of df
+    users = df['user'].astype(object)
+    x = users.value_counts().head()
+    df = round((users.value_counts() / df.shape[0]) * 100, 2).reset_index().rename(columns={'index': 'name', 'user': 'percent'})
     return x, df
 
 
-# ----------------- Word Cloud & Common Words -----------------
+# ----------------- Tokenization -----------------
+
+@functools.lru_cache(maxsize=None)
+def stop_words():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stop_hinglish_words.txt'), encoding='utf-8') as f:
+        return frozenset(f.read().split())
 
-def create_wordcloud(selected_user, df):
+
+# Lower-cased whitespace tokens of a whole chat in CSR form: the tokens of
+# message i are vocabulary[ids[offsets[i]:offsets[i + 1]]]
+ChatTokens = namedtuple('ChatTokens', ['vocabulary', 'ids', 'offsets', 'stop_words'])
+
+@_memoized_on_frame('tokens')
+def tokenize_words(df):
+    """Tokenize every message of ``df`` once and return its ``ChatTokens``.
+
+    The result is kept for as long as ``df`` itself is alive, so filtered views
+    should be derived after calling this on the full frame.
+    """
+    words = df['message'].str.lower().str.split()
+    lengths = words.str.len().to_numpy(dtype=np.int64)
+    ids, vocabulary = pd.factorize(np.fromiter(chain.from_iterable(words), dtype=object, count=lengths.sum()))
+    vocabulary = np.asarray(vocabulary, dtype=object)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return ChatTokens(
+        vocabulary=vocabulary,
+        ids=ids.astype(np.int32),
+        offsets=offsets,
+        stop_words=np.isin(vocabulary, list(stop_words())),
+    )
+
+
+def word_frequencies(selected_user, df, exclude_stop_words=True):
+    """Return word -> count for the selected user, ignoring media and notifications."""
+    tokens = tokenize_words(df)
+    rows = (df['user'] != 'group_notification') & (df['message'] != MEDIA_MESSAGE)
     if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    wc = WordCloud(width=500, height=500, min_font_size=10, background_color='white')
-    df_wc = wc.generate(df['message'].str.cat(sep=" "))
+        rows &= df['user'] == selected_user
+    selected = tokens.ids[np.repeat(rows.to_numpy(), np.diff(tokens.offsets))]
+    counts = np.bincount(selected, minlength=len(tokens.vocabulary))
+    if exclude_stop_words:
+        counts[tokens.stop_words] = 0
+    present = np.flatnonzero(counts)
+    return pd.Series(counts[present], index=tokens.vocabulary[present])
+
+
+# ----------------- Word Cloud & Common Words -----------------
+
+WORDCLOUD_BACKGROUNDS = {'light': 'white', 'dark': 'black'}
+
+
+def create_wordcloud(selected_user, df, theme='light'):
+    # Hinglish stop words are dropped by word_frequencies, English ones here
+    frequencies = word_frequencies(selected_user, df)
+    from wordcloud import WordCloud, STOPWORDS
+    frequencies = frequencies[~frequencies.index.isin(STOPWORDS)]
+    wc = WordCloud(width=500, height=500, min_font_size=10, background_color=WORDCLOUD_BACKGROUNDS[theme])
+    df_wc = wc.generate_from_frequencies(frequencies.to_dict())
     return df_wc
 
 
+def wordcloud_png(chat_key, selected_user, df, theme='light'):
+    """Return the word cloud as PNG bytes, rendered once per (chat, user, theme)."""
+    user_key = hashlib.sha256(selected_user.encode('utf-8')).hexdigest()[:16]
+    key = f"{chat_key}-wordcloud-{user_key}-{theme}"
+    png = cache.load_bytes(key, '.png')
+    if png is None:
+        buffer = io.BytesIO()
+        create_wordcloud(selected_user, df, theme).to_image().save(buffer, format='PNG')
+        png = buffer.getvalue()
+        cache.store_bytes(key, png, '.png')
+    return png
+
+
 def most_common_words(selected_user, df):
-    with open('stop_hinglish_words.txt', 'r') as f:
-        stop_words = f.read()
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    temp = df[df['user'] != 'group notification']
-    temp = temp[temp['message'] != '<Media omitted>\n']
-    words = []
-    for message in temp['message']:
-        for word in message.lower().split():
-            if word not in stop_words:
-                words.append(word)
-    most_common_df = pd.DataFrame(Counter(words).most_common(20))
+    frequencies = word_frequencies(selected_user, df)
+    # Stable sort keeps tied words in order of their first appearance in the chat
+    top = frequencies.sort_values(ascending=False, kind='stable').head(20)
+    most_common_df = pd.DataFrame(list(zip(top.index, top.to_numpy().tolist())))
     return most_common_df
 
 
 # ----------------- Emoji Analysis -----------------
 
-def emoji_helper(selected_user, df):
+# Code points that never start an emoji but extend the previous one: ZWJ,
+# variation selector 16, keycap, skin tone modifiers and tag characters
+EMOJI_EXTENDERS = (
+    {'\u200d', '\ufe0f', '\u20e3'}
+    | {chr(code) for code in range(0x1F3FB, 0x1F400)}
+    | {chr(code) for code in range(0xE0020, 0xE0080)}
+)
+
+
+def _char_class(chars):
+    # Collapse code points into ranges; sre tests astral classes range by range
+    codes = sorted(map(ord, chars))
+    ranges = [[codes[0], codes[0]]]
+    for code in codes[1:]:
+        if code == ranges[-1][1] + 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return '[' + ''.join(
+        re.escape(chr(start)) if start == end else re.escape(chr(start)) + '-' + re.escape(chr(end))
+        for start, end in ranges
+    ) + ']'
+
+
+def _build_emoji_pattern():
+    import emoji
+    bases = {c for e in emoji.EMOJI_DATA for c in e if not c.isascii() and c not in EMOJI_EXTENDERS}
+    regional = '[\U0001F1E6-\U0001F1FF]'
+    # The leading [^\x00-\xa8] lets the regex engine skip plain text quickly;
+    # the lookbehind then checks the character against the real emoji set.
+    element = (
+        '[^\x00-\xa8](?<=' + _char_class(bases | {chr(code) for code in range(0x1F1E6, 0x1F200)}) + ')'
+        + '(?:(?<=' + regional + ')' + regional + ')?'
+        + '[\ufe0f\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F]*'
+    )
+    keycap = '[#*0-9]\ufe0f?\u20e3'
+    return re.compile(keycap + '|' + element + '(?:\u200d' + element + ')*')
+
+
+@functools.lru_cache(maxsize=None)
+def emoji_pattern():
+    """Return the regex matching whole emoji sequences: ZWJ families, skin tones, flags and keycaps."""
+    return _build_emoji_pattern()
+
+
+@_memoized_on_frame('emojis')
+def tokenize_emojis(df):
+    """Return the emoji sequences of each message of ``df``, computed once per frame.
+
+    Pure ASCII messages cannot contain an emoji and are left as NaN without
+    being scanned.
+    """
+    messages = df['message']
+    candidates = ~messages.map(str.isascii).astype(bool)
+    return messages[candidates].str.findall(emoji_pattern()).reindex(df.index).rename('emojis')
+
+
+def _emoji_counts(selected_user, df):
+    emojis = tokenize_emojis(df)
     if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    emojis = []
-    for message in df['message']:
-        emojis.extend([c for c in message if emoji.is_emoji(c)])
-    emoji_df = pd.DataFrame(Counter(emojis).most_common(len(Counter(emojis))))
+        emojis = emojis[(df['user'] == selected_user).to_numpy()]
+    return Counter(chain.from_iterable(emojis.dropna()))
+
+
+def emoji_helper(selected_user, df):
+    counts = _emoji_counts(selected_user, df)
+    emoji_df = pd.DataFrame(counts.most_common(len(counts)))
     return emoji_df
 
 
 # ----------------- Timelines & Activity -----------------
 
-def monthly_timeline(selected_user, df):
+def monthly_timeline(selected_user, df, aggregates=None):
+    cached = _lookup(aggregates, selected_user, 'monthly_timeline')
+    if cached is not None:
+        return cached
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
+    df = preprocess.with_columns(df, 'month')
     timeline = df.groupby(['year', 'month_num', 'month']).count()['message'].reset_index()
     timeline['time'] = timeline['month'] + "-" + timeline['year'].astype(str)
     return timeline
 
 
-def daily_timeline(selected_user, df):
+def daily_timeline(selected_user, df, aggregates=None):
+    cached = _lookup(aggregates, selected_user, 'daily_timeline')
+    if cached is not None:
+        return cached
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
+    df = preprocess.with_columns(df, 'only_date')
     return df.groupby('only_date').count()['message'].reset_index()
 
 
-def week_activity_map(selected_user, df):
+def week_activity_map(selected_user, df, aggregates=None):
+    cached = _lookup(aggregates, selected_user, 'week_activity_map')
+    if cached is not None:
+        return cached
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
-    return df['day_name'].value_counts()
+    return preprocess.column(df, 'day_name').value_counts()
 
 
-def month_activity_map(selected_user, df):
+def month_activity_map(selected_user, df, aggregates=None):
+    cached = _lookup(aggregates, selected_user, 'month_activity_map')
+    if cached is not None:
+        return cached
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
-    return df['month'].value_counts()
+    return preprocess.column(df, 'month').value_counts()
 
 
-def activity_heapmap(selected_user, df):
+def activity_heapmap(selected_user, df, aggregates=None):
+    cached = _lookup(aggregates, selected_user, 'activity_heapmap')
+    if cached is not None:
+        return cached
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
+    df = preprocess.with_columns(df, 'day_name', 'period')
     return df.pivot_table(index='day_name', columns='period', values='message', aggfunc='count').fillna(0)
 
 
@@ -125,59 +471,107 @@ mood_map = {
 }
 
 
-def extract_mood_counts(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+# Emoji are looked up without variation selectors, so "❤️" and "❤" are both Love
+_mood_lookup = {key.replace('\ufe0f', ''): mood for key, mood in mood_map.items()}
+
 
+def extract_mood_counts(selected_user, df):
     mood_counter = Counter()
-    for message in df['message']:
-        for char in message:
-            if emoji.is_emoji(char) and char in mood_map:
-                mood_counter[mood_map[char]] += 1
+    for emoji_sequence, count in _emoji_counts(selected_user, df).items():
+        mood = _mood_lookup.get(emoji_sequence.replace('\ufe0f', ''))
+        if mood:
+            mood_counter[mood] += count
 
     return mood_counter
 
 
-def sentiment_analysis(selected_user, df):
-    if selected_user != "Overall":
-        df = df[df['user'] == selected_user]
+# Unique messages scored per task, and the number of unique messages above
+# which scoring fans out to a process pool
+SENTIMENT_BATCH_SIZE = 10_000
+SENTIMENT_PARALLEL_THRESHOLD = 50_000
+
+@functools.lru_cache(maxsize=None)
+def sentiment_analyzer():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
 
-    sentiments = {'Positive': 0, 'Neutral': 0, 'Negative': 0}
-    for message in df['message']:
-        blob = TextBlob(message)
-        polarity = blob.sentiment.polarity
-        if polarity > 0:
-            sentiments['Positive'] += 1
-        elif polarity == 0:
-            sentiments['Neutral'] += 1
-        else:
-            sentiments['Negative'] += 1
 
-    return sentiments
+def _score_batch(messages):
+    from textblob import TextBlob
+    analyzer = sentiment_analyzer()
+    scores = []
+    for message in messages:
+        polarity = TextBlob(message).sentiment.polarity
+        try:
+            compound = analyzer.polarity_scores(message)["compound"]
+        except Exception:
+            compound = float('nan')
+        scores.append((polarity, compound))
+    return scores
+
+
+@_memoized_on_frame('sentiment')
+def score_sentiment(df, processes=None):
+    """Return the TextBlob ``polarity`` and VADER ``compound`` scores of each message of ``df``.
+
+    Media placeholders, empty texts and group notifications are left as NaN.
+    Each distinct message is scored once; large chats are split into batches
+    scored by a process pool of ``processes`` workers (``processes=1`` keeps
+    everything in the current process). The scores are computed once per
+    frame.
+    """
+    messages = df['message']
+    scorable = (
+        (df['user'] != 'group_notification')
+        & (messages.str.strip() != '')
+        & ~messages.str.startswith('<Media')
+    )
+    unique = pd.unique(messages[scorable])
+    batches = [list(unique[i:i + SENTIMENT_BATCH_SIZE]) for i in range(0, len(unique), SENTIMENT_BATCH_SIZE)]
+    if len(unique) >= SENTIMENT_PARALLEL_THRESHOLD and processes != 1:
+        # Callers run in Streamlit and warm-up threads; forking a threaded process can deadlock
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(method)) as pool:
+            results = list(pool.map(_score_batch, batches))
+    else:
+        results = [_score_batch(batch) for batch in batches]
+    scores = pd.DataFrame(
+        [score for batch in results for score in batch],
+        index=pd.Index(unique, dtype=object),
+        columns=['polarity', 'compound'],
+        dtype=float,
+    )
+    return pd.DataFrame({
+        'polarity': messages.map(scores['polarity']).where(scorable),
+        'compound': messages.map(scores['compound']).where(scorable),
+    })
+
 
+def sentiment_analysis(selected_user, df):
+    scores = score_sentiment(df)
+    if selected_user != "Overall":
+        scores = scores[(df['user'] == selected_user).to_numpy()]
+
+    # Unscored messages (media, notifications) count as neutral
+    polarity = scores['polarity'].fillna(0)
+    return {
+        'Positive': int((polarity > 0).sum()),
+        'Neutral': int((polarity == 0).sum()),
+        'Negative': int((polarity < 0).sum()),
+    }
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 def detect_dominant_emotion(user, df):
+    scores = score_sentiment(df)
     if user != "Overall":
-        df = df[df['user'] == user]
+        scores = scores[(df['user'] == user).to_numpy()]
 
-    emotions = {"positive": 0, "neutral": 0, "negative": 0}
-    analyzer = SentimentIntensityAnalyzer()
-
-    for message in df['message']:
-        if not isinstance(message, str) or message.strip() == "" or message.startswith("<Media"):
-            continue
-        try:
-            score = analyzer.polarity_scores(message)["compound"]
-            if score >= 0.05:
-                emotions["positive"] += 1
-            elif score <= -0.05:
-                emotions["negative"] += 1
-            else:
-                emotions["neutral"] += 1
-        except:
-            continue
+    compound = scores['compound'].dropna()
+    emotions = {
+        "positive": int((compound >= 0.05).sum()),
+        "neutral": int(((compound > -0.05) & (compound < 0.05)).sum()),
+        "negative": int((compound <= -0.05).sum()),
+    }
 
     if sum(emotions.values()) == 0:
         return "neutral"
@@ -185,16 +579,18 @@ def detect_dominant_emotion(user, df):
     return max(emotions, key=emotions.get)
 
 
-
 # ----------------- AI Advice Generator -----------------
 
-def get_conversation_advice(selected_user, df):
+ADVICE_FALLBACK = "⚠️ Sorry, AI advice could not be generated. Please check your API key or try again later."
+
+
+def advice_prompt(selected_user, df):
     if selected_user != "Overall":
         df = df[df['user'] == selected_user]
 
     messages = "\n".join(df['message'].tolist())
 
-    prompt = f"""
+    return f"""
     Below are WhatsApp messages from {selected_user}. Analyze their mood, tone, and talk style.
     Then suggest how to communicate better with this person.
 
@@ -202,21 +598,42 @@ def get_conversation_advice(selected_user, df):
     {messages[:2000]}
     """
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
 
-    data = {
-        "model": "mistralai/mixtral-8x7b-instruct",
-        "messages": [{"role": "user", "content": prompt}]
-    }
+def get_conversation_advice(selected_user, df):
+    import advice
+    import requests
+    try:
+        return advice.complete(advice_prompt(selected_user, df))
+    except (requests.RequestException, ValueError) as e:
+        print("❌ Error:", e)
+        return ADVICE_FALLBACK
 
+
+def stream_conversation_advice(selected_user, df):
+    """Yield the advice for ``selected_user`` piece by piece as the model writes it."""
+    import advice
+    import requests
+    streamed = False
     try:
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data)
-        response_json = response.json()
-        return response_json['choices'][0]['message']['content']
-    except Exception as e:
+        for piece in advice.stream(advice_prompt(selected_user, df)):
+            streamed = True
+            yield piece
+    except (requests.RequestException, ValueError) as e:
         print("❌ Error:", e)
-        print("❌ Response JSON:", response.text)
-        return "⚠️ Sorry, AI advice could not be generated. Please check your API key or try again later."
+        yield "\n\n" + ADVICE_FALLBACK if streamed else ADVICE_FALLBACK
+
+
+def prefetch_conversation_advice(df, users=None):
+    """Fetch advice for ``users`` (default: every participant) concurrently.
+
+    Returns ``{user: advice}``; replies land in the disk cache, so later
+    calls to get_conversation_advice for these users return immediately.
+    """
+    import advice
+    if users is None:
+        users = sorted(u for u in df['user'].unique() if u != 'group_notification')
+    replies = advice.complete_many({user: advice_prompt(user, df) for user in users})
+    for user, reply in replies.items():
+        if isinstance(reply, Exception):
+            print(f"❌ Error for {user}:", reply)
+    return {user: ADVICE_FALLBACK if isinstance(reply, Exception) else reply for user, reply in replies.items()}
@@ -70,8 +70,60 @@ def render_navbar():
     with st.container():
         selected = st.radio(
         "Go to",
-        ["📊 Content Stats", "☁️ Word Cloud", "😀 Emoji Analysis", "🧠 Mood Analysis", "🤖 AI Mood Advice"],
+        ["📊 Content Stats", "☁️ Word Cloud", "😀 Emoji Analysis", "🧠 Mood Analysis", "🤖 AI Mood Advice", "💬 Conversations", "🔎 Search"],
         horizontal=True,
         key="navbar"
     )
     return selected
+
+
+def render_profiling_panel(profile, result_stats=None):
+    with st.sidebar.expander("⏱️ Profile", expanded=True):
+        st.caption(f"This rerun took {profile.seconds:.3f}s")
+
+        calls = [
+            dict(r._asdict(), name=" " * 4 * r.depth + r.name)
+            for r in profile.calls if r is not None
+        ]
+        if calls:
+            st.markdown("**Calls**")
+            st.dataframe(calls, hide_index=True)
+        else:
+            st.info("No instrumented calls in this rerun.")
+
+        if profile.cache:
+            st.markdown("**Cache**")
+            st.dataframe(
+                [{'cache': name, 'result': result, 'count': n} for (name, result), n in sorted(profile.cache.items())],
+                hide_index=True,
+            )
+
+        if result_stats:
+            st.markdown("**Result cache (all sessions)**")
+            st.caption(
+                f"{result_stats['entries']} results, {result_stats['bytes'] / 1e6:.1f} of "
+                f"{result_stats['max_bytes'] / 1e6:.0f} MB · {result_stats['hits']} hits, "
+                f"{result_stats['misses']} misses, {result_stats['evictions']} evictions"
+            )
+
+        st.download_button(
+            "⬇️ Export JSON",
+            profile.to_json(),
+            file_name=f"profile-{profile.started_at:%Y%m%dT%H%M%S}.json",
+            mime="application/json",
+        )
+
+
+def render_warmup_progress(progress):
+    """Show how far the background warm-up is; ``progress()`` returns ``(done, total)``."""
+    # Refreshed on its own every second, without rerunning the whole app
+    @st.fragment(run_every=1.0)
+    def warmup_progress():
+        done, total = progress()
+        if total and done < total:
+            st.progress(done / total, text=f"⚡ Preparing sections: {done}/{total}")
+        elif total:
+            st.caption(f"⚡ All {total} sections are ready")
+
+    with st.sidebar:
+        warmup_progress()
@@ -1,46 +1,286 @@
+import io
+import os
 import re
+from collections import namedtuple
+from contextlib import closing
+from itertools import chain, islice
+import numpy as np
 import pandas as pd
-def preprocess(data):
-    pattern = '\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s'
-    messages = re.split(pattern, data)[1:]
-    dates = re.findall(pattern, data)
+
+# A message header ("25/07/2025, 08:01 - ") starts every new message; lines
+# that do not start with one belong to the previous (multi-line) message.
+# Known WhatsApp export variants: header regex and the datetime formats it
+# may use, tried in order. Formats assume the header was normalized by
+# _normalize_headers (no LRM marks, plain spaces).
+HEADER_VARIANTS = {
+    'android-24h': (
+        r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s',
+        ['%d/%m/%Y, %H:%M - ', '%d/%m/%y, %H:%M - ', '%m/%d/%Y, %H:%M - ', '%m/%d/%y, %H:%M - '],
+    ),
+    'android-12h': (
+        r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s[AaPp]\.?[Mm]\.?\s-\s',
+        ['%d/%m/%Y, %I:%M %p - ', '%d/%m/%y, %I:%M %p - ', '%m/%d/%Y, %I:%M %p - ', '%m/%d/%y, %I:%M %p - '],
+    ),
+    'android-dotted': (
+        r'\d{1,2}\.\d{1,2}\.\d{2,4},?\s\d{1,2}:\d{2}\s-\s',
+        ['%d.%m.%Y, %H:%M - ', '%d.%m.%y, %H:%M - ', '%d.%m.%Y %H:%M - ', '%d.%m.%y %H:%M - '],
+    ),
+    'ios-24h': (
+        r'\u200e?\[\d{1,2}[/.]\d{1,2}[/.]\d{2,4},\s\d{1,2}:\d{2}:\d{2}\]\s',
+        ['[%d/%m/%Y, %H:%M:%S] ', '[%d/%m/%y, %H:%M:%S] ', '[%m/%d/%Y, %H:%M:%S] ', '[%m/%d/%y, %H:%M:%S] ',
+         '[%d.%m.%Y, %H:%M:%S] ', '[%d.%m.%y, %H:%M:%S] '],
+    ),
+    'ios-12h': (
+        r'\u200e?\[\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}:\d{2}\s[AaPp]\.?[Mm]\.?\]\s',
+        ['[%d/%m/%Y, %I:%M:%S %p] ', '[%d/%m/%y, %I:%M:%S %p] ', '[%m/%d/%Y, %I:%M:%S %p] ', '[%m/%d/%y, %I:%M:%S %p] '],
+    ),
+}
+
+HeaderFormat = namedtuple('HeaderFormat', ['name', 'pattern', 'date_format'])
+
+DEFAULT_HEADER_FORMAT = HeaderFormat('android-24h', re.compile(HEADER_VARIANTS['android-24h'][0]), '%d/%m/%Y, %H:%M - ')
+
+# Number of leading lines sampled to detect the header format
+SAMPLE_LINES = 500
+
+# LRM marks are dropped, narrow/no-break spaces (12-hour clocks) become spaces
+_HEADER_TRANSLATION = {0x200e: None, 0x202f: ' ', 0xa0: ' '}
+
+# "Author: text" -> ('Author', 'text'). Only the first ': ' separates the
+# author, the rest of the message is kept as is.
+AUTHOR_PATTERN = re.compile(r'^([\w\W]+?):\s([\w\W]*)')
+
+# Hour of day -> label of the one-hour slot used by the activity heatmap
+PERIOD_LABELS = np.array(
+    ['00-1'] + [f"{hour}-{hour + 1}" for hour in range(1, 23)] + ['23-00'],
+    dtype=object,
+)
+
+# Stored dtypes of the parsed frame: authors are few and repeat on every row,
+# calendar fields fit in one or two bytes
+COMPACT_DTYPES = {
+    'user': 'category',
+    'year': 'int16',
+    'month_num': 'int8',
+    'day': 'int8',
+    'hour': 'int8',
+    'minute': 'int8',
+}
+
+
+def _only_date(dates):
+    # Convert each distinct day once; rows of the same day share one date object
+    codes, days = pd.factorize(dates.dt.floor('D'))
+    lookup = np.array([day.date() for day in days] + [pd.NaT], dtype=object)
+    return pd.Series(lookup[codes], index=dates.index, dtype=object)
+
+
+# Columns derived from ``date`` that are not stored in the parsed frame but
+# computed on demand by ``column``/``with_columns``
+DERIVED_COLUMNS = {
+    'only_date': _only_date,
+    'month': lambda dates: dates.dt.month_name(),
+    'day_name': lambda dates: dates.dt.day_name(),
+    'period': lambda dates: pd.Series(PERIOD_LABELS[dates.dt.hour.to_numpy()], index=dates.index, dtype=object),
+}
+
+# Number of messages converted to a DataFrame at a time. Only one chunk of raw
+# Python strings is alive at once, the rest is already in columnar form.
+CHUNK_ROWS = 100_000
+
+
+def _open_source(source, encoding='utf-8'):
+    """Return ``(stream, close)`` for a text stream decoded incrementally.
+
+    ``source`` may be the chat text itself (``str``), raw ``bytes``, a path
+    (``os.PathLike``) or any binary/text file-like object such as Streamlit's
+    ``UploadedFile``. ``close`` releases the stream without closing a buffer
+    that belongs to the caller.
+    """
+    if isinstance(source, str):
+        return io.StringIO(source), lambda: None
+    if isinstance(source, io.TextIOBase):
+        return source, lambda: None
+    owned = False
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif isinstance(source, os.PathLike):
+        source = open(source, 'rb')
+        owned = True
+    # newline='' keeps '\r\n' untouched, exactly like decoding the whole file
+    stream = io.TextIOWrapper(source, encoding=encoding, newline='')
+    return stream, stream.close if owned else stream.detach
+
+
+def make_header_format(name, date_format):
+    return HeaderFormat(name, re.compile(HEADER_VARIANTS[name][0]), date_format)
+
+
+def _normalize_headers(headers, date_format):
+    # Plain ASCII 24-hour headers (the common case) are parsed as they are
+    if not headers.map(str.isascii).all():
+        headers = headers.str.translate(_HEADER_TRANSLATION)
+    if '%p' in date_format:
+        headers = headers.str.replace('.m.', 'm', regex=False)
+    return headers
+
+
+def detect_format(lines):
+    """Pick the ``HeaderFormat`` matching most of the sampled ``lines``.
+
+    The date format is the first candidate of that variant that parses every
+    sampled header, so day/month order and 2/4-digit years are resolved once
+    instead of inferring formats row by row.
+    """
+    best_name, best_headers = None, []
+    for name, (pattern, _) in HEADER_VARIANTS.items():
+        regex = re.compile(pattern)
+        headers = [match.group() for match in map(regex.match, lines) if match]
+        if len(headers) > len(best_headers):
+            best_name, best_headers = name, headers
+    if best_name is None:
+        return DEFAULT_HEADER_FORMAT
+
+    sample = pd.Series(best_headers, dtype=object)
+    for date_format in HEADER_VARIANTS[best_name][1]:
+        parsed = pd.to_datetime(_normalize_headers(sample, date_format), format=date_format, errors='coerce')
+        if parsed.notna().all():
+            return make_header_format(best_name, date_format)
+    raise ValueError(f"Unsupported timestamp format in chat headers, e.g. {best_headers[0]!r}")
+
+
+def _split_messages(lines, pattern):
+    header = None
+    body = []
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            if header is not None:
+                yield header, ''.join(body)
+            header = match.group()
+            body = [line[match.end():]]
+        elif header is not None:
+            body.append(line)
+    if header is not None:
+        yield header, ''.join(body)
+
+
+def _read_messages(source, encoding='utf-8', header_format=None):
+    # Yields the header format in use first, then the (header, body) pairs
+    stream, close = _open_source(source, encoding)
+    try:
+        sample = list(islice(stream, SAMPLE_LINES))
+        if header_format is None:
+            header_format = detect_format(sample)
+        yield header_format
+        yield from _split_messages(chain(sample, stream), header_format.pattern)
+    finally:
+        close()
+
+
+def iter_messages(source, encoding='utf-8', header_format=None):
+    """Yield ``(header, body)`` pairs from a chat export in a single pass.
+
+    The body keeps its trailing newline and any continuation lines, so the
+    output matches what splitting the whole text on headers would produce.
+    Text before the first header is skipped. The header format is detected
+    from the first lines unless given.
+    """
+    messages = _read_messages(source, encoding, header_format)
+    next(messages)
+    yield from messages
+
+
+def _build_frame(dates, user_messages, date_format):
     # Create DataFrame
-    df = pd.DataFrame({'user_message': messages, 'message_date': dates})
+    df = pd.DataFrame({
+        'user_message': pd.Series(user_messages, dtype=object),
+        'message_date': pd.Series(dates, dtype=object),
+    })
 
     # Convert message_date to datetime format
-    df['message_date'] = pd.to_datetime(df['message_date'], format='%d/%m/%Y, %H:%M - ')
+    df['message_date'] = pd.to_datetime(_normalize_headers(df['message_date'], date_format), format=date_format)
 
     # Rename column
     df.rename(columns={'message_date': 'date'}, inplace=True)
 
-    users = []
-    messages = []
-    for message in df['user_message']:
-        entry = re.split('([\w\W]+?):\s', message)
-        if entry[1:]:
-            users.append(entry[1])
-            messages.append(entry[2])
-        else:
-            users.append('group_notification')
-            messages.append(entry[0])
-    df['user'] = users
-    df['message'] = messages
+    # Split "Author: text"; lines without an author are system notifications
+    parts = df['user_message'].str.extract(AUTHOR_PATTERN)
+    df['user'] = parts[0].fillna('group_notification')
+    df['message'] = parts[1].fillna(df['user_message'])
     df.drop(columns=['user_message'], inplace=True)
-    df['only_date']=df['date'].dt.date
-    df['year']=df['date'].dt.year
-    df['month_num']=df['date'].dt.month
-    df['month'] = df['date'].dt.month_name()
+    df['year'] = df['date'].dt.year
+    df['month_num'] = df['date'].dt.month
     df['day'] = df['date'].dt.day
-    df['day_name']=df['date'].dt.day_name()
     df['hour'] = df['date'].dt.hour
     df['minute'] = df['date'].dt.minute
-    period = []
-    for hour in df[['day_name','hour']]['hour']:
-        if hour==23:
-            period.append(str(hour)+"-"+str('00'))
-        elif hour==0:
-            period.append(str('00')+"-"+str(hour+1))
-        else:
-            period.append(str(hour)+"-"+str(hour+1))
-    df['period'] = period
-    return df
\ No newline at end of file
+    return compact(df)
+
+
+def compact(df):
+    """Return ``df`` with the columns of COMPACT_DTYPES converted to their compact dtype.
+
+    Frames concatenated from chunks with different author categories fall
+    back to object and are categorized again here.
+    """
+    dtypes = {name: dtype for name, dtype in COMPACT_DTYPES.items() if name in df.columns and df[name].dtype != dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+def column(df, name):
+    """Return column ``name`` of a parsed frame, deriving it from ``date`` if it is not stored."""
+    if name in df.columns:
+        return df[name]
+    return DERIVED_COLUMNS[name](df['date']).rename(name)
+
+
+def with_columns(df, *names):
+    """Return ``df`` with the derived columns ``names`` added (a new frame if any were missing)."""
+    missing = [name for name in names if name not in df.columns]
+    if not missing:
+        return df
+    return df.assign(**{name: DERIVED_COLUMNS[name](df['date']) for name in missing})
+
+
+def memory_report(df):
+    """Return the deep memory use of each column of ``df``, in bytes and bytes per message."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': usage,
+        'bytes_per_message': usage / max(len(df), 1),
+    })
+    report.loc['total'] = ['', usage.sum(), usage.sum() / max(len(df), 1)]
+    return report
+
+
+def preprocess(data, encoding='utf-8', chunk_rows=CHUNK_ROWS, header_format=None):
+    """Parse a WhatsApp export into one row per message.
+
+    ``data`` is anything accepted by ``_open_source``. The export is read line
+    by line and converted in chunks of ``chunk_rows`` messages, so peak memory
+    follows the size of the resulting frame rather than the raw text. The
+    timestamp format is detected once from the first lines (see
+    ``detect_format``) unless ``header_format`` is given.
+
+    Authors are categorical and calendar fields small integers (see
+    COMPACT_DTYPES); ``only_date``, ``month``, ``day_name`` and ``period``
+    are derived from ``date`` on demand by ``column``/``with_columns``.
+    """
+    with closing(_read_messages(data, encoding, header_format)) as messages:
+        header_format = next(messages)
+        chunks = []
+        dates = []
+        user_messages = []
+        for header, body in messages:
+            dates.append(header)
+            user_messages.append(body)
+            if len(dates) >= chunk_rows:
+                chunks.append(_build_frame(dates, user_messages, header_format.date_format))
+                dates = []
+                user_messages = []
+    if user_messages or not chunks:
+        chunks.append(_build_frame(dates, user_messages, header_format.date_format))
+    if len(chunks) == 1:
+        return chunks[0]
+    return compact(pd.concat(chunks, ignore_index=True))
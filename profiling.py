@@ -0,0 +1,187 @@
+# profiling.py
+#
+# Opt-in instrumentation of the parser, the helper functions and the section
+# renderers. While a Profile is active on the current thread (one Streamlit
+# rerun), every instrumented call records its wall time, input/output rows and
+# peak traced memory, and cache lookups are counted as hits or misses:
+#
+#     profiling.instrument(helper)
+#     with profiling.Profile() as profile:
+#         helper.fetch_stats('Overall', df)
+#     profile.to_json()
+#
+# With no active Profile the wrappers only cost one attribute lookup per call.
+
+import functools
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+
+# depth is the nesting level: helpers called by a renderer have depth 1, etc.
+CallRecord = namedtuple('CallRecord', ['name', 'depth', 'seconds', 'rows_in', 'rows_out', 'peak_mb'])
+
+_state = threading.local()
+
+# Python < 3.9 has no reset_peak; nested calls then report the enclosing peak
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+def current():
+    """Return the Profile active on this thread, or None."""
+    return getattr(_state, 'profile', None)
+
+
+def _rows(value):
+    # DataFrames and Series have a shape; lists of tuples and dicts are not rows
+    shape = getattr(value, 'shape', None)
+    return shape[0] if shape else None
+
+
+class Profile:
+    """Calls and cache lookups recorded while the profile is active.
+
+    tracemalloc is process-wide, so peak memory is only meaningful when one
+    profile runs at a time.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.calls = []
+        self.cache = Counter()
+        self.started_at = None
+        self.seconds = None
+        self._stack = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def start(self):
+        stop()
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _state.profile = self
+        return self
+
+    def stop(self):
+        if current() is self:
+            _state.profile = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.seconds = time.perf_counter() - self._started
+        return self
+
+    def count(self, name, hit):
+        self.cache[(name, 'hits' if hit else 'misses')] += 1
+
+    def call(self, name, func, args, kwargs):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current_bytes, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][0] = max(self._stack[-1][0], peak)
+            if _reset_peak:
+                _reset_peak()
+        # [highest peak seen inside this call, traced bytes when it started]
+        frame = [0, current_bytes if tracing else 0]
+        self._stack.append(frame)
+        index = len(self.calls)
+        self.calls.append(None)  # keeps callers ahead of their callees
+        rows_in = next((r for r in map(_rows, list(args) + list(kwargs.values())) if r is not None), None)
+        result = None
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            seconds = time.perf_counter() - started
+            self._stack.pop()
+            peak_mb = None
+            if tracing and tracemalloc.is_tracing():
+                peak = max(frame[0], tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1][0] = max(self._stack[-1][0], peak)
+                peak_mb = (peak - frame[1]) / 1e6
+            self.calls[index] = CallRecord(name, len(self._stack), seconds, rows_in, _rows(result), peak_mb)
+
+    def totals(self):
+        """Return ``{name: (calls, seconds)}`` summed over all recorded calls."""
+        totals = {}
+        for record in self.calls:
+            if record is None:
+                continue
+            calls, seconds = totals.get(record.name, (0, 0.0))
+            totals[record.name] = (calls + 1, seconds + record.seconds)
+        return totals
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'seconds': self.seconds,
+            'calls': [r._asdict() for r in self.calls if r is not None],
+            'cache': [{'cache': name, 'result': result, 'count': n} for (name, result), n in sorted(self.cache.items())],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+
+def stop():
+    """Stop and return the profile active on this thread, if any.
+
+    Streamlit ends a rerun early on st.rerun()/st.stop(), so the app calls
+    this first to finish a profile left over from an interrupted rerun.
+    """
+    profile = current()
+    return None if profile is None else profile.stop()
+
+
+def count(name, hit):
+    """Record a cache hit or miss on the active profile, if any."""
+    profile = current()
+    if profile is not None:
+        profile.count(name, hit)
+
+
+def timed(func, name=None):
+    """Wrap ``func`` so calls are recorded by the active profile."""
+    if getattr(func, '__profiled__', False):
+        return func
+    name = name or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = current()
+        if profile is None:
+            return func(*args, **kwargs)
+        return profile.call(name, func, args, kwargs)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+def instrument(module, names=None):
+    """Replace the public functions of ``module`` (or just ``names``) with timed wrappers.
+
+    Calls between functions of the same module go through the module globals,
+    so they are recorded as nested calls. Safe to call on every rerun.
+    """
+    if names is None:
+        names = [
+            name for name, obj in vars(module).items()
+            if inspect.isfunction(obj) and obj.__module__ == module.__name__ and not name.startswith('_')
+        ]
+    for name in names:
+        setattr(module, name, timed(getattr(module, name)))
@@ -0,0 +1,116 @@
+# search.py
+
+from collections import namedtuple
+import os
+import re
+import numpy as np
+import pandas as pd
+import cache
+import profiling
+
+# Inverted index of a parsed chat in CSR form: the rows (positions in the
+# frame) that contain vocabulary[t] are postings[offsets[t]:offsets[t + 1]],
+# sorted ascending. The vocabulary itself is sorted so prefixes are ranges.
+SearchIndex = namedtuple('SearchIndex', ['vocabulary', 'postings', 'offsets'])
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+_INDEX_SUFFIX = '.index.npz'
+
+
+def normalize(text):
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def build_index(df):
+    terms = df['message'].str.casefold().str.findall(TOKEN_PATTERN)
+    lengths = terms.str.len().to_numpy(dtype=np.int64)
+    rows = np.repeat(np.arange(len(df), dtype=np.int32), lengths)
+    flat = np.fromiter((t for message in terms for t in message), dtype=object, count=lengths.sum())
+    codes, uniques = pd.factorize(flat)
+    order = np.argsort(np.asarray(uniques, dtype=object))
+    vocabulary = np.asarray(uniques, dtype=object)[order]
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    term_ids = ranks[codes]
+
+    # One posting per (term, row) pair, grouped by term and sorted by row
+    pairs = np.unique(term_ids.astype(np.int64) * len(df) + rows)
+    term_ids, postings = np.divmod(pairs, max(len(df), 1))
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+    return SearchIndex(vocabulary, postings.astype(np.int32), offsets)
+
+
+def _term_rows(index, term, prefix=False):
+    lo = np.searchsorted(index.vocabulary, term, side='left')
+    if prefix:
+        hi = np.searchsorted(index.vocabulary, term + chr(0x10FFFF), side='left')
+    else:
+        hi = lo + 1 if lo < len(index.vocabulary) and index.vocabulary[lo] == term else lo
+    if hi - lo == 1:
+        return index.postings[index.offsets[lo]:index.offsets[hi]]
+    return np.unique(index.postings[index.offsets[lo]:index.offsets[hi]])
+
+
+def search(index, df, query, selected_user='Overall', start=None, end=None, limit=200):
+    """Return ``(total, matches)`` for messages containing every word of ``query``.
+
+    The last word also matches as a prefix so results update while typing.
+    ``start``/``end`` are inclusive dates; ``matches`` holds at most ``limit``
+    rows of ``df``, newest first.
+    """
+    terms = normalize(query)
+    if not terms:
+        return 0, df.iloc[:0]
+
+    rows = None
+    for i, term in enumerate(terms):
+        term_rows = _term_rows(index, term, prefix=i == len(terms) - 1)
+        rows = term_rows if rows is None else np.intersect1d(rows, term_rows, assume_unique=True)
+        if len(rows) == 0:
+            return 0, df.iloc[:0]
+
+    if selected_user != 'Overall':
+        rows = rows[df['user'].to_numpy()[rows] == selected_user]
+    if start is not None:
+        rows = rows[df['date'].to_numpy()[rows] >= np.datetime64(pd.Timestamp(start))]
+    if end is not None:
+        rows = rows[df['date'].to_numpy()[rows] < np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1))]
+
+    return len(rows), df.iloc[rows[::-1][:limit]]
+
+
+def store_index(key, index):
+    os.makedirs(cache.CACHE_DIR, exist_ok=True)
+    path = cache.cache_path(key, _INDEX_SUFFIX)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Tokens never contain a newline, so the vocabulary is stored as one blob
+    vocabulary = np.frombuffer('\n'.join(index.vocabulary).encode('utf-8'), dtype=np.uint8)
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, vocabulary=vocabulary, postings=index.postings, offsets=index.offsets)
+    os.replace(tmp_path, path)
+    cache.evict()
+
+
+def load_index(key):
+    path = cache.cache_path(key, _INDEX_SUFFIX)
+    try:
+        with np.load(path) as data:
+            words = data['vocabulary'].tobytes().decode('utf-8')
+            vocabulary = np.array(words.split('\n') if words else [], dtype=object)
+            index = SearchIndex(vocabulary, data['postings'], data['offsets'])
+    except (FileNotFoundError, OSError, ValueError, KeyError):
+        profiling.count(f"disk {_INDEX_SUFFIX}", False)
+        return None
+    profiling.count(f"disk {_INDEX_SUFFIX}", True)
+    os.utime(path)
+    return index
+
+
+def load_or_build_index(key, df):
+    index = load_index(key)
+    if index is None:
+        index = build_index(df)
+        store_index(key, index)
+    return index
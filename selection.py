@@ -1,16 +1,34 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+import cache
+import charts
+import conversations
 import helper
-import plotly.express as px
+import search
+import time
 
+# Plotting libraries are imported inside the sections that draw charts, so
+# they only load once a user opens one of them
 
-def show_mood_analysis(df, selected_user):
+ADVICE_RENDER_INTERVAL = 0.1
+
+
+# Each prepare_* function computes (or fetches from the result cache) what its
+# section shows; the warm-up runs them in the background with the same keys.
+
+def prepare_mood(df, selected_user, chat_key=None):
+    sentiment_result = cache.cached_result(chat_key, selected_user, 'sentiment',
+                                           lambda: helper.sentiment_analysis(selected_user, df))
+    mood_counts = cache.cached_result(chat_key, selected_user, 'moods',
+                                      lambda: helper.extract_mood_counts(selected_user, df))
+    return sentiment_result, mood_counts
+
+
+def show_mood_analysis(df, selected_user, chat_key=None):
+    import plotly.express as px
     st.markdown("## 🧠 Mood / Sentiment Analysis", unsafe_allow_html=True)
 
-    sentiment_result = helper.sentiment_analysis(selected_user, df)
-    mood_counts = helper.extract_mood_counts(selected_user, df)
+    sentiment_result, mood_counts = prepare_mood(df, selected_user, chat_key)
 
     mood_emojis = {
         "Love": "❤️",
@@ -61,11 +79,17 @@ def show_mood_analysis(df, selected_user):
         st.plotly_chart(fig2, use_container_width=True)
 
 
-def show_ai_advice(df, selected_user):
+def show_ai_advice(df, selected_user, chat_key=None):
     st.markdown("### 🤖 AI Mood Advice", unsafe_allow_html=True)
 
     if selected_user == "Overall":
         st.warning("⚠️ Please select a specific user to receive personalized advice.")
+        # Fetching every participant at once makes switching users instant
+        if st.button("⚡ Prepare advice for all users"):
+            with st.spinner("🔍 Generating AI suggestions for everyone..."):
+                for user, text in helper.prefetch_conversation_advice(df).items():
+                    st.session_state[f"advice_{user}"] = text
+            st.success("Advice is ready. Pick a user in the sidebar to read it.")
         return
 
     # Session state key per user to avoid repeating advice
@@ -73,32 +97,34 @@ def show_ai_advice(df, selected_user):
     emotion_key = f"emotion_{selected_user}"
 
     # Only generate if not already present
-    if advice_key not in st.session_state or emotion_key not in st.session_state:
-        with st.spinner("🔍 Analyzing mood and generating AI suggestions..."):
-            st.session_state[emotion_key] = helper.detect_dominant_emotion(selected_user, df)
-            st.session_state[advice_key] = helper.get_conversation_advice(selected_user, df)
+    if emotion_key not in st.session_state:
+        with st.spinner("🔍 Analyzing mood..."):
+            st.session_state[emotion_key] = cache.cached_result(
+                chat_key, selected_user, 'dominant_emotion', lambda: helper.detect_dominant_emotion(selected_user, df))
 
-    # Show cached values
     dominant_emotion = st.session_state[emotion_key]
-    advice = st.session_state[advice_key]
 
     st.subheader("🧠 Dominant Emotion")
     st.success(f"Detected mood for **{selected_user}**: **{dominant_emotion.capitalize()}**")
 
     st.subheader("💬 Jarvis AI Suggests")
 
-    # Show animated advice only once
-    if f"animated_{selected_user}" not in st.session_state:
-        with st.empty():
-            import time
-            animated_text = ""
-            for char in advice:
-                animated_text += char
-                st.markdown(f"<div style='color:#00ffff; font-size:18px;'>{animated_text}█</div>", unsafe_allow_html=True)
-                time.sleep(0.01)
-        st.session_state[f"animated_{selected_user}"] = True
+    if advice_key in st.session_state:
+        st.markdown(f"<div style='color:#00ffff; font-size:18px;'>{st.session_state[advice_key]}</div>", unsafe_allow_html=True)
     else:
-        st.markdown(f"<div style='color:#00ffff; font-size:18px;'>{advice}</div>", unsafe_allow_html=True)
+        # Write the reply as the model streams it, re-rendering at most every
+        # ADVICE_RENDER_INTERVAL seconds instead of once per token
+        placeholder = st.empty()
+        placeholder.markdown("🔍 Generating AI suggestions...")
+        advice = ""
+        last_render = 0.0
+        for piece in helper.stream_conversation_advice(selected_user, df):
+            advice += piece
+            if time.monotonic() - last_render >= ADVICE_RENDER_INTERVAL:
+                placeholder.markdown(f"<div style='color:#00ffff; font-size:18px;'>{advice}█</div>", unsafe_allow_html=True)
+                last_render = time.monotonic()
+        placeholder.markdown(f"<div style='color:#00ffff; font-size:18px;'>{advice}</div>", unsafe_allow_html=True)
+        st.session_state[advice_key] = advice
 
     # Optional input from user
     st.markdown("---")
@@ -123,9 +149,37 @@ def show_ai_advice(df, selected_user):
             st.warning("Thanks for the feedback. We'll try to improve! 💡")
 
 
-def show_stats(df, selected_user):
+def prepare_stats(df, selected_user, aggregates=None, chat_key=None):
+    def result(name, func):
+        return cache.cached_result(chat_key, selected_user, name, lambda: func(selected_user, df, aggregates))
+
+    results = {
+        'stats': result('stats', helper.fetch_stats),
+        'monthly_timeline': result('monthly_timeline', helper.monthly_timeline),
+        'daily_timeline': result('daily_timeline', helper.daily_timeline),
+        'week_activity': result('week_activity', helper.week_activity_map),
+        'month_activity': result('month_activity', helper.month_activity_map),
+        'activity_heatmap': result('activity_heatmap', helper.activity_heapmap),
+    }
+    results['monthly_timeline_figure'] = cache.cached_result(
+        chat_key, selected_user, 'monthly_timeline_figure',
+        lambda: charts.line_figure(results['monthly_timeline'], 'time', 'message', 'Monthly Message Trend'))
+    # Long histories are resampled or downsampled before they reach the browser
+    results['daily_timeline_figure'] = cache.cached_result(
+        chat_key, selected_user, 'daily_timeline_figure',
+        lambda: charts.daily_timeline_figure(results['daily_timeline']))
+    results['activity_heatmap_figure'] = cache.cached_result(
+        chat_key, selected_user, 'activity_heatmap_figure',
+        lambda: charts.heatmap_figure(results['activity_heatmap']))
+    return results
+
+
+def show_stats(df, selected_user, aggregates=None, chat_key=None):
+    import plotly.express as px
     st.markdown("## 📊 Chat Statistics", unsafe_allow_html=True)
-    num_messages, words, num_media, num_links = helper.fetch_stats(selected_user, df)
+
+    results = prepare_stats(df, selected_user, aggregates, chat_key)
+    num_messages, words, num_media, num_links = results['stats']
 
     with st.expander("📈 Overview", expanded=True):
         col1, col2, col3, col4 = st.columns(4)
@@ -135,46 +189,51 @@ def show_stats(df, selected_user):
         col4.metric("Links Shared", num_links)
 
     with st.expander("📅 Monthly Timeline", expanded=True):
-        timeline = helper.monthly_timeline(selected_user, df)
-        fig = px.line(timeline, x='time', y='message', title='Monthly Message Trend', markers=True)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(results['monthly_timeline_figure'], use_container_width=True)
 
     with st.expander("📆 Daily Timeline", expanded=True):
-        timeline = helper.daily_timeline(selected_user, df)
-        fig = px.line(timeline, x='only_date', y='message', title='Daily Message Count', markers=True)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(results['daily_timeline_figure'], use_container_width=True)
 
     with st.expander("📌 Activity Map", expanded=True):
         col1, col2 = st.columns(2)
         with col1:
-            busy_day = helper.week_activity_map(selected_user, df)
+            busy_day = results['week_activity']
             fig = px.bar(x=busy_day.index, y=busy_day.values, labels={'x': 'Day', 'y': 'Messages'},
                          title='Most Active Days', color_discrete_sequence=['#FF69B4'])
             st.plotly_chart(fig, use_container_width=True)
         with col2:
-            busy_month = helper.month_activity_map(selected_user, df)
+            busy_month = results['month_activity']
             fig = px.bar(x=busy_month.index, y=busy_month.values, labels={'x': 'Month', 'y': 'Messages'},
                          title='Most Active Months', color_discrete_sequence=['#FFD700'])
             st.plotly_chart(fig, use_container_width=True)
 
-        heatmap = helper.activity_heapmap(selected_user, df)
         st.write("### 🗓️ Weekly Heatmap")
-        fig, ax = plt.subplots()
-        sns.heatmap(heatmap, ax=ax)
-        st.pyplot(fig)
+        st.plotly_chart(results['activity_heatmap_figure'], use_container_width=True)
+
 
+def prepare_wordcloud(df, selected_user, chat_key, theme='light'):
+    try:
+        png = cache.cached_result(chat_key, selected_user, 'wordcloud',
+                                  lambda: helper.wordcloud_png(chat_key, selected_user, df, theme), theme=theme)
+    except ValueError:
+        # Not enough words to build a word cloud
+        png = None
+    most_common_df = cache.cached_result(chat_key, selected_user, 'common_words',
+                                         lambda: helper.most_common_words(selected_user, df))
+    return png, most_common_df
 
-def show_wordcloud(df, selected_user):
+
+def show_wordcloud(df, selected_user, chat_key, theme='light'):
+    import plotly.express as px
     st.markdown("## ☁️ Word Cloud", unsafe_allow_html=True)
-    df_wc = helper.create_wordcloud(selected_user, df)
+    png, most_common_df = prepare_wordcloud(df, selected_user, chat_key, theme)
     with st.expander("Word Cloud", expanded=True):
-        fig, ax = plt.subplots()
-        ax.imshow(df_wc)
-        ax.axis("off")
-        st.pyplot(fig)
+        if png is None:
+            st.warning("Not enough words to build a word cloud.")
+        else:
+            st.image(png, use_container_width=True)
 
     with st.expander("Most Common Words", expanded=True):
-        most_common_df = helper.most_common_words(selected_user, df)
         fig2 = px.bar(most_common_df, x=1, y=0, orientation='h',
                      labels={"0": "Word", "1": "Count"},
                      title="Top Used Words",
@@ -182,9 +241,14 @@ def show_wordcloud(df, selected_user):
         st.plotly_chart(fig2, use_container_width=True)
 
 
-def show_emoji_analysis(df, selected_user):
+def prepare_emoji(df, selected_user, chat_key=None):
+    return cache.cached_result(chat_key, selected_user, 'emoji', lambda: helper.emoji_helper(selected_user, df))
+
+
+def show_emoji_analysis(df, selected_user, chat_key=None):
+    import plotly.express as px
     st.markdown("## 😀 Emoji Analysis", unsafe_allow_html=True)
-    emoji_df = helper.emoji_helper(selected_user, df)
+    emoji_df = prepare_emoji(df, selected_user, chat_key)
 
     with st.expander("Emoji Usage Table", expanded=True):
         st.dataframe(emoji_df)
@@ -196,3 +260,107 @@ def show_emoji_analysis(df, selected_user):
             st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("No emojis found in selected chat.")
+
+
+def show_search(df, selected_user, index, date_range=None):
+    st.markdown("## 🔎 Search Messages", unsafe_allow_html=True)
+
+    query = st.text_input("Search for words", placeholder="e.g., pizza tonight", key="search_query")
+    first_day, last_day = df['date'].min().date(), df['date'].max().date()
+    date_range = st.date_input("Between", value=date_range or (first_day, last_day), min_value=first_day,
+                               max_value=last_day, key="search_range")
+    start, end = date_range if len(date_range) == 2 else (date_range[0], None)
+
+    if not query.strip():
+        st.info("Type a word to search the chat. The last word also matches as a prefix.")
+        return
+
+    started = time.perf_counter()
+    total, matches = search.search(index, df, query, selected_user, start, end)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    st.caption(f"{total} matching messages in {elapsed:.1f} ms" + (f" (showing newest {len(matches)})" if total > len(matches) else ""))
+    if total:
+        st.dataframe(matches[['date', 'user', 'message']], use_container_width=True, hide_index=True)
+
+
+def prepare_conversations(df, chat_key=None, gap_minutes=30):
+    # Computed for the whole chat once per gap; the selected user only filters the views
+    return cache.cached_result(chat_key, 'Overall', 'conversations',
+                               lambda: conversations.analyze(df, pd.Timedelta(minutes=gap_minutes)),
+                               gap=gap_minutes)
+
+
+def show_conversations(df, selected_user, chat_key=None):
+    import plotly.express as px
+    st.markdown("## 💬 Conversations", unsafe_allow_html=True)
+
+    gap_minutes = st.slider("Minutes of silence that end a conversation", 5, 240, 30, step=5, key="session_gap")
+    stats = prepare_conversations(df, chat_key, gap_minutes)
+    if stats.sessions.empty:
+        st.warning("No conversations found in selected chat.")
+        return
+
+    latencies = stats.latencies.set_index('user')
+    with st.expander("📈 Overview", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        if selected_user == "Overall":
+            col1.metric("Conversations", len(stats.sessions))
+            col2.metric("Messages per Conversation", f"{stats.sessions['messages'].mean():.1f}")
+            col3.metric("Replies", int(latencies['replies'].sum()))
+            col4.metric("Busiest Initiator", stats.initiators.index[0])
+        else:
+            replies_to = stats.reply_matrix.loc[selected_user] if selected_user in stats.reply_matrix.index else None
+            col1.metric("Conversations Started", int(stats.initiators.get(selected_user, 0)))
+            col2.metric("Conversations Ended", int((stats.sessions['closer'] == selected_user).sum()))
+            median = latencies['p50'].get(selected_user)
+            col3.metric("Median Reply Time", "–" if median is None or pd.isna(median) else f"{median / 60:.1f} min")
+            col4.metric("Replies Most To", replies_to.idxmax() if replies_to is not None and replies_to.any() else "–")
+
+    with st.expander("🚀 Who Starts Conversations", expanded=True):
+        fig = px.bar(x=stats.initiators.index, y=stats.initiators.values, labels={'x': 'User', 'y': 'Conversations'},
+                     title='Conversations Started', color_discrete_sequence=['#00BFFF'])
+        st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("⏱️ Reply Times (minutes)", expanded=True):
+        table = stats.latencies.copy()
+        table[table.columns[2:]] = (table[table.columns[2:]] / 60).round(1)
+        if selected_user != "Overall":
+            table = table[table['user'] == selected_user]
+        st.dataframe(table, hide_index=True, use_container_width=True)
+
+    with st.expander("🔁 Who Replies to Whom", expanded=True):
+        # Keep the matrix readable in large groups
+        top = stats.latencies['user'].head(20)
+        matrix = stats.reply_matrix.loc[top, top]
+        fig = px.imshow(matrix, aspect='auto', color_continuous_scale='Viridis',
+                        labels={'x': 'Replied to', 'y': 'Reply from', 'color': 'Replies'})
+        st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("📋 Longest Conversations", expanded=False):
+        sessions = stats.sessions
+        if selected_user != "Overall":
+            sessions = sessions[sessions['initiator'] == selected_user]
+        st.dataframe(sessions.nlargest(10, 'messages'), hide_index=True, use_container_width=True)
+
+
+# ----------------- Warm-up -----------------
+
+def warmup_tasks(df, users, aggregates=None, chat_key=None, theme='light'):
+    """Return the ``(user, section, compute)`` tasks that prepare every section for ``users``.
+
+    Sections are named by their navbar label; the AI advice (a paid remote
+    call) and the search (an index kept in the session) are not prepared.
+    """
+    tasks = []
+    for user in users:
+        tasks += [
+            (user, "📊 Content Stats", lambda user=user: prepare_stats(df, user, aggregates, chat_key)),
+            (user, "☁️ Word Cloud", lambda user=user: prepare_wordcloud(df, user, chat_key, theme)),
+            (user, "😀 Emoji Analysis", lambda user=user: prepare_emoji(df, user, chat_key)),
+            (user, "🧠 Mood Analysis", lambda user=user: prepare_mood(df, user, chat_key)),
+        ]
+        if user == "Overall":
+            # One result for every user, at the default idle gap
+            tasks.append((user, "💬 Conversations", lambda: prepare_conversations(df, chat_key)))
+    return tasks
@@ -0,0 +1,300 @@
+# store.py
+#
+# Optional SQLite message store. Parsed chats are kept in one local database
+# file, indexed by (chat, user, date), and the timeline and stats aggregations
+# run as GROUP BY queries inside SQLite instead of on an in-memory frame. Many
+# chats can be stored, listed and compared without loading them:
+#
+#     store.load_chat(key, df, name='family.txt')
+#     aggregates = store.aggregates(key)       # same shape as helper.build_aggregates
+#     helper.monthly_timeline('Overall', df, aggregates)
+#
+# The app uses it when CHAT_STORE_PATH is set; cli.py with --store.
+
+from collections.abc import Mapping
+import datetime
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from preprocess import PERIOD_LABELS
+
+STORE_PATH = os.getenv("CHAT_STORE_PATH") or os.path.join(os.getcwd(), "chats.sqlite")
+# The app only keeps chats in the store when a path is configured
+ENABLED = bool(os.getenv("CHAT_STORE_PATH"))
+
+# strftime('%w') is 0 for Sunday
+DAY_NAMES = ('Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December')
+
+_INSERT_ROWS = 50_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT,
+    loaded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id INTEGER NOT NULL REFERENCES chats(id),
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    message TEXT NOT NULL,
+    words INTEGER NOT NULL,
+    media INTEGER NOT NULL,
+    links INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_chat_user_date ON messages (chat_id, user, date);
+CREATE INDEX IF NOT EXISTS messages_chat_date ON messages (chat_id, date);
+"""
+
+
+# Store files whose schema this process has created or checked already
+_ready_paths = set()
+_ready_paths_lock = threading.Lock()
+
+
+def connect(path=None, check_same_thread=True):
+    """Open the store at ``path`` (default STORE_PATH), creating the schema on first use."""
+    path = path or STORE_PATH
+    conn = sqlite3.connect(path, timeout=60, check_same_thread=check_same_thread)
+    with _ready_paths_lock:
+        if path not in _ready_paths:
+            # Both persist in the file, so later connections skip them
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _ready_paths.add(path)
+    return conn
+
+
+def _chat_id(conn, key):
+    row = conn.execute("SELECT id FROM chats WHERE key = ?", (key,)).fetchone()
+    return None if row is None else row[0]
+
+
+def has_chat(key, path=None):
+    conn = connect(path)
+    try:
+        return _chat_id(conn, key) is not None
+    finally:
+        conn.close()
+
+
+def load_chat(key, df, name=None, path=None):
+    """Store the parsed chat ``df`` under ``key``, replacing an earlier copy."""
+    import helper
+
+    words = np.diff(helper.tokenize_words(df).offsets)
+    links = helper.count_links(df).to_numpy()
+    media = (df['message'] == helper.MEDIA_MESSAGE).to_numpy()
+    dates = df['date'].dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+    users = df['user'].astype(object).to_numpy()
+    messages = df['message'].to_numpy()
+
+    conn = connect(path)
+    try:
+        with conn:
+            chat_id = _chat_id(conn, key)
+            if chat_id is not None:
+                conn.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+                conn.execute("UPDATE chats SET name = ?, loaded_at = ? WHERE id = ?",
+                             (name, datetime.datetime.now().isoformat(timespec='seconds'), chat_id))
+            else:
+                chat_id = conn.execute("INSERT INTO chats (key, name, loaded_at) VALUES (?, ?, ?)",
+                                       (key, name, datetime.datetime.now().isoformat(timespec='seconds'))).lastrowid
+            for start in range(0, len(df), _INSERT_ROWS):
+                end = start + _INSERT_ROWS
+                conn.executemany(
+                    "INSERT INTO messages (chat_id, user, date, message, words, media, links) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    zip([chat_id] * len(users[start:end]), users[start:end], dates[start:end], messages[start:end],
+                        words[start:end].tolist(), media[start:end].tolist(), links[start:end].tolist()),
+                )
+    finally:
+        conn.close()
+    return chat_id
+
+
+def chats(path=None):
+    """Return one row per stored chat with its totals, for listing and comparing chats."""
+    conn = connect(path)
+    try:
+        return pd.read_sql_query("""
+            SELECT c.key, c.name, c.loaded_at,
+                   COUNT(m.chat_id) AS messages,
+                   COUNT(DISTINCT m.user) AS users,
+                   COALESCE(SUM(m.words), 0) AS words,
+                   COALESCE(SUM(m.media), 0) AS media,
+                   COALESCE(SUM(m.links), 0) AS links,
+                   MIN(m.date) AS first_message,
+                   MAX(m.date) AS last_message
+            FROM chats c LEFT JOIN messages m ON m.chat_id = c.id
+            GROUP BY c.id
+            ORDER BY c.loaded_at DESC
+        """, conn)
+    finally:
+        conn.close()
+
+
+# ----------------- Aggregations -----------------
+
+# Each query returns the same result as the helper function of the same name.
+# ``where`` selects the chat, user and date range; see _where.
+
+def _where(chat_id, selected_user, start, end):
+    clauses, params = ["chat_id = ?"], [chat_id]
+    if selected_user != 'Overall':
+        clauses.append("user = ?")
+        params.append(selected_user)
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(f"{start:%Y-%m-%d}")
+    if end is not None:
+        clauses.append("date < ?")
+        params.append(f"{end + datetime.timedelta(days=1):%Y-%m-%d}")
+    return " AND ".join(clauses), params
+
+
+def _fetch_stats(conn, where, params):
+    row = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(words), 0), COALESCE(SUM(media), 0), COALESCE(SUM(links), 0) "
+        f"FROM messages WHERE {where}", params).fetchone()
+    return tuple(int(value) for value in row)
+
+
+def _monthly_timeline(conn, where, params):
+    rows = conn.execute(
+        f"SELECT CAST(strftime('%Y', date) AS INTEGER) AS year, CAST(strftime('%m', date) AS INTEGER) AS month_num, "
+        f"COUNT(*) FROM messages WHERE {where} GROUP BY year, month_num ORDER BY year, month_num", params).fetchall()
+    return pd.DataFrame(
+        [(year, month_num, MONTH_NAMES[month_num - 1], count, f"{MONTH_NAMES[month_num - 1]}-{year}")
+         for year, month_num, count in rows],
+        columns=['year', 'month_num', 'month', 'message', 'time'])
+
+
+def _daily_timeline(conn, where, params):
+    rows = conn.execute(
+        f"SELECT date(date) AS day, COUNT(*) FROM messages WHERE {where} GROUP BY day ORDER BY day", params).fetchall()
+    return pd.DataFrame(
+        [(datetime.date.fromisoformat(day), count) for day, count in rows], columns=['only_date', 'message'])
+
+
+def _counts_by(conn, where, params, field, names):
+    rows = conn.execute(
+        f"SELECT CAST(strftime('{field}', date) AS INTEGER) AS k, COUNT(*) FROM messages WHERE {where} GROUP BY k",
+        params).fetchall()
+    counts = pd.Series([n for _, n in rows], index=pd.Index([names[k] for k, _ in rows], dtype=str),
+                       dtype='int64')
+    # Same ordering steps as the cube: grouped (sorted) by name, then by count
+    return counts.sort_index().sort_values(ascending=False)
+
+
+def _week_activity_map(conn, where, params):
+    return _counts_by(conn, where, params, '%w', DAY_NAMES).rename_axis('day_name').rename('count')
+
+
+def _month_activity_map(conn, where, params):
+    return _counts_by(conn, where, params, '%m', (None,) + MONTH_NAMES).rename_axis('month').rename('count')
+
+
+def _activity_heapmap(conn, where, params):
+    rows = conn.execute(
+        f"SELECT CAST(strftime('%w', date) AS INTEGER) AS d, CAST(strftime('%H', date) AS INTEGER) AS h, COUNT(*) "
+        f"FROM messages WHERE {where} GROUP BY d, h", params).fetchall()
+    cells = pd.DataFrame({
+        'day_name': pd.Series([DAY_NAMES[d] for d, _, _ in rows], dtype=str),
+        'period': PERIOD_LABELS[np.array([h for _, h, _ in rows], dtype=np.int64)],
+        'messages': np.array([n for _, _, n in rows], dtype=np.int64),
+    })
+    return cells.groupby(['day_name', 'period'])['messages'].sum().unstack('period', fill_value=0).astype(float)
+
+
+AGGREGATIONS = {
+    'fetch_stats': _fetch_stats,
+    'monthly_timeline': _monthly_timeline,
+    'daily_timeline': _daily_timeline,
+    'week_activity_map': _week_activity_map,
+    'month_activity_map': _month_activity_map,
+    'activity_heapmap': _activity_heapmap,
+}
+
+
+def most_busy_users(key, start=None, end=None, path=None):
+    """Return ``(top five message counts, percent per user)`` of the stored chat, by SQL.
+
+    Unlike ``helper.most_busy_users``, which counts every row of the frame it
+    is given, group notifications are always left out and the percentages are
+    of the remaining messages. Ties keep the order of first appearance.
+    """
+    conn = connect(path)
+    try:
+        where, params = _where(_chat_id(conn, key), 'Overall', start, end)
+        rows = conn.execute(
+            f"SELECT user, COUNT(*) AS n FROM messages WHERE {where} AND user != 'group_notification' "
+            f"GROUP BY user ORDER BY n DESC, MIN(rowid)", params).fetchall()
+    finally:
+        conn.close()
+    counts = pd.Series(dict(rows), dtype='int64').rename_axis('user').rename('count')
+    x = counts.head()
+    df = round((counts / counts.sum()) * 100, 2).reset_index().rename(columns={'index': 'name', 'user': 'percent'})
+    return x, df
+
+
+class _UserAggregates(Mapping):
+    # The helper results of one user, each queried on first access
+
+    def __init__(self, store_aggregates, user):
+        self._store = store_aggregates
+        self._user = user
+        self._results = {}
+
+    def __getitem__(self, name):
+        if name not in self._results:
+            self._results[name] = self._store.query(name, self._user)
+        return self._results[name]
+
+    def __iter__(self):
+        return iter(AGGREGATIONS)
+
+    def __len__(self):
+        return len(AGGREGATIONS)
+
+
+class StoreAggregates(Mapping):
+    """``{user: {function_name: result}}`` like ``helper.build_aggregates``, answered by SQL on demand.
+
+    All queries go through one read connection, shared by the threads of the
+    app (sessions and warm-up) one query at a time.
+    """
+
+    def __init__(self, key, start=None, end=None, path=None):
+        self.key, self.start, self.end, self.path = key, start, end, path
+        self._conn = connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._chat_id = _chat_id(self._conn, key)
+        if self._chat_id is None:
+            self._conn.close()
+            raise KeyError(key)
+        where, params = _where(self._chat_id, 'Overall', start, end)
+        users = [user for (user,) in self._conn.execute(f"SELECT DISTINCT user FROM messages WHERE {where}", params)]
+        self._users = {user: _UserAggregates(self, user) for user in ['Overall'] + users}
+
+    def query(self, name, user):
+        with self._lock:
+            return AGGREGATIONS[name](self._conn, *_where(self._chat_id, user, self.start, self.end))
+
+    def __getitem__(self, user):
+        return self._users[user]
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+
+def aggregates(key, start=None, end=None, path=None):
+    """Return the stored chat's aggregates between the inclusive dates ``start`` and ``end``."""
+    return StoreAggregates(key, start, end, path)
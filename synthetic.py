@@ -0,0 +1,94 @@
+# synthetic.py
+#
+# Generates WhatsApp exports in the same format as agressivechat.txt for
+# benchmarks and load tests:
+#
+#     python synthetic.py chat_1m.txt --messages 1000000 --users 25
+
+import argparse
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+
+WORDS = (
+    "hi hello ok okay yes no maybe sure thanks please sorry love miss you me we they the a to and is "
+    "are was will can cant dont didnt why what when where how today tomorrow yesterday tonight now "
+    "later soon call text meet home work office college class exam movie dinner lunch party trip "
+    "weekend plan time late early good bad great nice cool funny tired busy free happy sad angry "
+    "really seriously actually literally again always never everyone someone nothing anything "
+    "acha accha kya nahi haan bhai yaar kal aaj abhi thik hai mujhe tumhe kuch bas chalo pakka"
+).split()
+
+EMOJIS = ["😂", "❤️", "👍", "🙏", "😍", "😭", "🎉", "😄", "🤗", "😢", "🤬", "😘", "🫂", "👍🏽", "👨‍👩‍👧", "🇮🇳", "🔥", "💖"]
+
+DOMAINS = ["youtube.com", "instagram.com", "google.com", "github.com", "en.wikipedia.org", "example.co.in"]
+
+FIRST_NAMES = ["Rohit", "Ananya", "Priya", "Arjun", "Sneha", "Vikram", "Neha", "Karan", "Pooja", "Rahul", "Isha", "Aman"]
+
+
+def _user_names(n_users):
+    names = []
+    for i in range(n_users):
+        name = FIRST_NAMES[i % len(FIRST_NAMES)]
+        names.append(name if i < len(FIRST_NAMES) else f"{name} {i // len(FIRST_NAMES)}")
+    return names
+
+
+def generate_lines(messages, users=5, multiline=0.03, emoji=0.15, url=0.01, media=0.04,
+                   notifications=0.002, seed=0, start=datetime(2020, 1, 1)):
+    """Yield the lines of a synthetic export with ``messages`` messages.
+
+    The ratio arguments are per-message probabilities. Users are picked with
+    a skewed distribution so a few people dominate the chat, like real groups.
+    """
+    rng = random.Random(seed)
+    names = _user_names(users)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(users)))
+    when = start
+    for _ in range(messages):
+        when += timedelta(seconds=int(rng.expovariate(1 / 300)))
+        header = f"{when.day:02d}/{when.month:02d}/{when.year}, {when.hour:02d}:{when.minute:02d} - "
+
+        if rng.random() < notifications:
+            yield f"{header}{rng.choice(names)} joined using this group's invite link\n"
+            continue
+
+        author = rng.choices(names, cum_weights=cum_weights)[0]
+        if rng.random() < media:
+            yield f"{header}{author}: <Media omitted>\n"
+            continue
+
+        text = " ".join(rng.choices(WORDS, k=rng.randint(1, 14)))
+        if rng.random() < emoji:
+            text += " " + "".join(rng.choices(EMOJIS, k=rng.randint(1, 3)))
+        if rng.random() < url:
+            text += f" https://{rng.choice(DOMAINS)}/{rng.randint(1, 10 ** 6)}"
+        if rng.random() < multiline:
+            text += "\n" + " ".join(rng.choices(WORDS, k=rng.randint(1, 10)))
+        yield f"{header}{author}: {text}\n"
+
+
+def write_chat(path, messages, **options):
+    """Stream a synthetic export with ``messages`` messages to ``path``."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(generate_lines(messages, **options))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic WhatsApp chat export.")
+    parser.add_argument('path', help="output .txt file")
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--multiline', type=float, default=0.03, help="share of multi-line messages")
+    parser.add_argument('--emoji', type=float, default=0.15, help="share of messages with emoji")
+    parser.add_argument('--url', type=float, default=0.01, help="share of messages with a link")
+    parser.add_argument('--media', type=float, default=0.04, help="share of media placeholders")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_chat(args.path, args.messages, users=args.users, multiline=args.multiline, emoji=args.emoji,
+               url=args.url, media=args.media, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
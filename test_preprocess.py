@@ -0,0 +1,75 @@
+# test_preprocess.py
+#
+# Equivalence of the vectorized author split and period labels with the
+# per-row loops they replaced (inlined below as the reference):
+#
+#     python -m pytest test_preprocess.py
+
+import pathlib
+import re
+import pytest
+import preprocess
+import synthetic
+
+HERE = pathlib.Path(__file__).resolve().parent
+
+
+def reference_split(user_messages):
+    # The original author loop
+    users = []
+    messages = []
+    for message in user_messages:
+        entry = re.split(r'([\w\W]+?):\s', message)
+        if entry[1:]:
+            users.append(entry[1])
+            messages.append(entry[2])
+        else:
+            users.append('group_notification')
+            messages.append(entry[0])
+    return users, messages
+
+
+def reference_period(hours):
+    # The original period loop
+    period = []
+    for hour in hours:
+        if hour == 23:
+            period.append(str(hour) + "-" + str('00'))
+        elif hour == 0:
+            period.append(str('00') + "-" + str(hour + 1))
+        else:
+            period.append(str(hour) + "-" + str(hour + 1))
+    return period
+
+
+def synthetic_chat():
+    return "".join(synthetic.generate_lines(5000, users=8, multiline=0.1, notifications=0.01, seed=3))
+
+
+@pytest.mark.parametrize('chat', [
+    pytest.param((HERE / 'agressivechat.txt').read_text(encoding='utf-8'), id='agressivechat'),
+    pytest.param(synthetic_chat(), id='synthetic'),
+])
+def test_matches_reference_loops(chat):
+    df = preprocess.preprocess(chat)
+    bodies = [body for _, body in preprocess.iter_messages(chat)]
+    users, messages = reference_split(bodies)
+
+    assert df['user'].astype(object).tolist() == users
+    assert df['message'].tolist() == messages
+    assert preprocess.column(df, 'period').tolist() == reference_period(df['hour'].tolist())
+
+
+def test_every_hour_has_the_reference_period():
+    assert preprocess.PERIOD_LABELS.tolist() == reference_period(range(24))
+
+
+def test_only_the_first_colon_separates_the_author():
+    # The one deliberate difference: re.split also split on every later ': ',
+    # which emptied messages such as 'A: x: y'
+    chat = "25/07/2025, 08:01 - A: x: y\n"
+    assert reference_split([body for _, body in preprocess.iter_messages(chat)]) == (['A'], [''])
+
+    df = preprocess.preprocess(chat)
+    assert df['user'].astype(object).tolist() == ['A']
+    assert df['message'].tolist() == ['x: y\n']
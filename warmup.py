@@ -0,0 +1,152 @@
+# warmup.py
+#
+# Background warm-up of the analysis sections. As soon as a chat (or a new
+# date range) is ready, the app queues every section for 'Overall' and the
+# busiest users; a small pool of daemon threads computes them into the result
+# cache shared by all sessions (cache.results), so opening a tab later is a
+# cache hit:
+#
+#     warmup.pool.submit(view_key, [(user, section, compute), ...])
+#     with warmup.pool.claim(view_key, user, section):
+#         selection.show_stats(...)
+#
+# A section the user opens is taken out of the queue and computed by the
+# requesting session right away, ahead of everything still queued; only if a
+# worker is computing that very section does the session wait for it, instead
+# of computing it a second time. Sections that are done or never queued do
+# not wait at all. The frames are shared by the sessions and the workers and
+# never changed: the helpers keep per-message results next to a frame, not
+# as columns added to it.
+
+import contextlib
+import os
+import threading
+from collections import deque
+
+# Background threads; 0 turns the warm-up off
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", 2))
+# Besides 'Overall', sections are prepared for this many of the busiest users
+WARMUP_USERS = int(os.getenv("WARMUP_USERS", 3))
+
+
+class _View:
+    # Progress of one view (chat and date range)
+
+    def __init__(self):
+        self.total = self.done = self.failed = 0
+        self.tasks = set()  # keys submitted and not cancelled, whether queued, running or done
+
+
+class WarmupPool:
+    """Queue of section computations drained by background threads, in submission order."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._queue = deque()  # task keys
+        self._pending = {}  # task key -> compute
+        self._running = {}  # task key -> Event set when it is done
+        self._views = {}  # view_key -> _View
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def submit(self, view_key, tasks):
+        """Queue ``tasks`` of ``(user, section, compute)`` for the view, in the given order.
+
+        Tasks of this view that are queued, running or done already are skipped.
+        """
+        if self.workers <= 0:
+            return
+        with self._condition:
+            view = self._views.setdefault(view_key, _View())
+            for user, section, compute in tasks:
+                key = (view_key, user, section)
+                if key in view.tasks:
+                    continue
+                self._pending[key] = compute
+                view.tasks.add(key)
+                view.total += 1
+                self._queue.append(key)
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"warmup-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._condition.notify_all()
+
+    def cancel(self, view_key):
+        """Drop the queued tasks of a view, e.g. after the user picked another chat or date range."""
+        with self._condition:
+            view = self._views.get(view_key)
+            for key in [key for key in self._pending if key[0] == view_key]:
+                del self._pending[key]
+                view.tasks.discard(key)
+                view.total -= 1
+
+    def progress(self, view_key):
+        """Return ``(done, total)`` tasks of the view; failed tasks count as done."""
+        with self._condition:
+            view = self._views.get(view_key)
+            return (view.done + view.failed, view.total) if view else (0, 0)
+
+    @contextlib.contextmanager
+    def claim(self, view_key, user, section):
+        """Run the body as the computation of this section, ahead of the queue.
+
+        A queued task for it is removed; if a worker is computing it right
+        now, its result is waited for. Otherwise the body runs at once.
+        """
+        key = (view_key, user, section)
+        with self._condition:
+            claimed = self._pending.pop(key, None) is not None
+            running = self._running.get(key)
+        if running is not None:
+            running.wait()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            # Also when the rerun was interrupted; the section is computed when opened again
+            if claimed:
+                self._finish(key, failed)
+
+    def _finish(self, key, failed):
+        with self._condition:
+            view = self._views[key[0]]
+            if failed:
+                view.failed += 1
+            else:
+                view.done += 1
+
+    def _next(self):
+        with self._condition:
+            while True:
+                while self._queue:
+                    key = self._queue.popleft()
+                    compute = self._pending.pop(key, None)
+                    # Claimed or cancelled tasks stay in the queue until popped
+                    if compute is not None:
+                        self._running[key] = threading.Event()
+                        return key, compute
+                self._condition.wait()
+
+    def _work(self):
+        while True:
+            key, compute = self._next()
+            failed = False
+            try:
+                compute()
+            except Exception as e:
+                failed = True
+                print(f"❌ Warm-up of {key[2]} for {key[1]} failed:", e)
+            self._finish(key, failed)
+            with self._condition:
+                self._running.pop(key).set()
+
+
+pool = WarmupPool(WARMUP_WORKERS)
+
+
+def busiest_users(df, n=WARMUP_USERS):
+    """Return the ``n`` users with the most messages in ``df``, busiest first."""
+    users = df.loc[df['user'] != 'group_notification', 'user'].astype(object)
+    return users.value_counts().index[:n].tolist()